@@ -1,13 +1,21 @@
 import streamlit as st
 import pandas as pd
+import numpy as np
 import datetime
+import html
+import threading
+import uuid
 from modules.database_handler import DatabaseHandler
 from modules.email_handler import EmailHandler
 from modules.calendar_handler import CalendarHandler
 from streamlit_quill import st_quill
 from modules.sheet_updater import SheetsUpdater
+from config import LOCAL_TZ
 import re
 
+_SHEET_ID_RE = re.compile(r'/spreadsheets/d/([a-zA-Z0-9_-]+)')
+APPLICANTS_PAGE_SIZE = 50
+
 # --- Page Configuration & Resource Caching ---
 st.set_page_config(page_title="HR Applicant Dashboard", page_icon="📑", layout="wide")
 
@@ -26,38 +34,135 @@ sheets_updater = get_sheets_updater()
 calendar_handler = get_calendar_handler()
 
 # --- Cached Data Fetching Functions ---
+# A shared resource rather than cache_data so a status edit reaches every session without a refetch (see patch_applicant_status);
+# the frame itself is never modified, so callers can read it without locking
+@st.cache_resource(ttl=600)
+def load_applicants_summary():
+    """Loads only the columns the list view needs; heavy text fields are fetched per applicant.
+    Returns a holder whose 'current' is (frame, revision); the revision changes whenever the frame does, so caches derived from it key on that."""
+    df = db_handler.fetch_applicants_summary_as_df()
+    if not df.empty:
+        # Lowercased copies so search can use plain substring matching instead of case-insensitive regex
+        df['_name_l'] = df['Name'].str.lower(); df['_email_l'] = df['Email'].str.lower()
+        # Low-cardinality columns as categoricals: equality filters and unique() work on integer codes
+        df['Status'] = df['Status'].astype('category'); df['Domain'] = df['Domain'].astype('category')
+        # Index by Id (keeping the column) so single-applicant lookups are hash lookups rather than full scans
+        df = df.set_index('Id', drop=False).rename_axis(None)
+    return {'current': (df, uuid.uuid4().hex), 'lock': threading.Lock()}
+
 @st.cache_data(ttl=600)
-def load_all_applicants():
-    df = db_handler.fetch_applicants_as_df()
-    rename_map = {
-        'id': 'Id', 'name': 'Name', 'email': 'Email', 'phone': 'Phone', 'domain': 'Domain',
-        'education': 'Education', 'job_history': 'JobHistory', 'cv_url': 'CvUrl', 'status': 'Status',
-        'created_at': 'CreatedAt', 'gmail_thread_id': 'GmailThreadId'
-    }
-    return df.rename(columns=rename_map)
-
-@st.cache_data(ttl=3600)
+def load_applicant_full(applicant_id): return db_handler.fetch_applicant(applicant_id)
+
+# Reference data only changes through the Settings tab, which clears these caches explicitly
+@st.cache_data(persist="disk")
 def load_statuses(): return db_handler.get_statuses()
-@st.cache_data(ttl=3600)
+@st.cache_data(persist="disk")
 def load_interviewers(): return db_handler.get_interviewers()
+@st.cache_data(ttl=300)
+def load_applicant_bundle(applicant_id):
+    bundle = db_handler.get_applicant_bundle(applicant_id)
+    interviews = bundle['interviews']
+    if not interviews.empty: interviews['start_time'] = pd.to_datetime(interviews['start_time'], utc=True).dt.tz_convert(LOCAL_TZ.key)
+    return bundle
 @st.cache_data(ttl=600)
-def load_interviews(applicant_id): return db_handler.get_interviews_for_applicant(applicant_id)
+def load_export_logs():
+    logs = db_handler.fetch_export_logs()
+    if not logs.empty:
+        logs['created_at'] = pd.to_datetime(logs['created_at'], utc=True).dt.tz_convert(LOCAL_TZ.key)
+        logs['display_date'] = logs['created_at'].dt.strftime('%b %d, %H:%M')
+    return logs
+
+@st.cache_data(ttl=60)
+def cached_read_sheet(spreadsheet_id): return sheets_updater.read_sheet_data(spreadsheet_id)
+
+def _interviewers_fingerprint(d): return tuple(zip(d.get('id', []), d.get('name', []), d.get('email', [])))
+
+@st.cache_data(ttl=3600, hash_funcs={pd.DataFrame: _interviewers_fingerprint})
+def build_interviewer_options(interviewer_list):
+    if interviewer_list.empty: return {}
+    return {f"{name} ({email})": email for name, email in zip(interviewer_list['name'], interviewer_list['email'])}
+@st.cache_data(ttl=3600, hash_funcs={pd.DataFrame: _interviewers_fingerprint})
+def interviewer_email_to_id(interviewer_list):
+    if interviewer_list.empty: return {}
+    return dict(zip(interviewer_list['email'], interviewer_list['id'].tolist()))
+# The summary frame is passed unhashed (leading underscore); its revision token stands in for it in the cache key
+@st.cache_data
+def compute_filter_options(_df, revision): return sorted(_df['Status'].dropna().unique().tolist()), sorted(_df['Domain'].dropna().unique().tolist())
+# A resource cache so hits return the shared slice instead of unpickling a copy; callers treat it as read-only
+@st.cache_resource(max_entries=50)
+def apply_filters(_df, revision, status_filter, domain_filter, search_query):
+    # Combine every active condition into one mask so the frame is sliced once
+    mask = np.ones(len(_df), dtype=bool)
+    if status_filter != 'All':
+        mask &= (_df['Status'] == status_filter).to_numpy()
+    if domain_filter != 'All':
+        mask &= (_df['Domain'] == domain_filter).to_numpy()
+    if search_query:
+        query_lower = search_query.lower()
+        mask &= (
+            _df['_name_l'].str.contains(query_lower, regex=False, na=False).to_numpy() |
+            _df['_email_l'].str.contains(query_lower, regex=False, na=False).to_numpy()
+        )
+    return _df if mask.all() else _df[mask]
 
 
 if 'selected_applicant_id' not in st.session_state: st.session_state.selected_applicant_id = None
 if 'selected_applicants_bulk' not in st.session_state: st.session_state.selected_applicants_bulk = set()
 if 'confirm_delete' not in st.session_state: st.session_state.confirm_delete = False
+if 'grid_version' not in st.session_state: st.session_state.grid_version = 0
+if 'applicant_page' not in st.session_state: st.session_state.applicant_page = 0
+
+# A new search or filter starts from the first page instead of wherever the previous result set was paged to
+def reset_applicant_page(): st.session_state.applicant_page = 0
 
+APPLICANT_STATE_PREFIXES = ('schedule_', 'formatted_slots_', 'email_body_', 'show_hub_', 'show_schedule_', 'composing_')
 def clear_applicant_specific_state():
     """Clears session state keys related to a specific applicant's actions."""
-    for key in list(st.session_state.keys()):
-        if key.startswith('schedule_') or key.startswith('available_slots_') or \
-           key.startswith('email_body_') or key.startswith('show_hub_') or key.startswith('show_schedule_'):
-            del st.session_state[key]
+    for key in [k for k in st.session_state.keys() if k.startswith(APPLICANT_STATE_PREFIXES)]: del st.session_state[key]
+
+def forget_applicants(applicant_ids):
+    """Drops cached data for deleted applicants without evicting anyone else's cached details."""
+    load_applicants_summary.clear()
+    for applicant_id in applicant_ids: load_applicant_full.clear(applicant_id); load_applicant_bundle.clear(applicant_id)
+
+def patch_applicant_status(applicant_id, new_status):
+    """Applies a saved status change to the shared summary frame instead of refetching every applicant."""
+    summary = load_applicants_summary()
+    # Copy, patch, then swap the pair in one assignment: other sessions keep reading the frame they already hold.
+    # The lock only serializes concurrent edits, so one doesn't overwrite the other's copy
+    with summary['lock']:
+        df = summary['current'][0]
+        if applicant_id not in df.index: load_applicants_summary.clear(); return
+        df = df.copy()
+        if new_status not in df['Status'].cat.categories: df['Status'] = df['Status'].cat.add_categories([new_status])
+        df.at[applicant_id, 'Status'] = new_status
+        summary['current'] = (df, uuid.uuid4().hex) # New revision: the filter caches recompute instead of serving pre-edit results
+
+def refresh_database_caches():
+    """Drops everything read from the database; caches derived from those frames are keyed on their revision or contents and stay valid."""
+    for loader in (load_applicants_summary, load_applicant_full, load_statuses, load_interviewers, load_applicant_bundle, load_export_logs): loader.clear()
+
+def toggle_select_all(applicant_ids):
+    """Adds or removes the visible applicants from the bulk selection to match the select-all checkbox."""
+    if st.session_state.select_all_visible_checkbox: st.session_state.selected_applicants_bulk.update(applicant_ids)
+    else: st.session_state.selected_applicants_bulk.difference_update(applicant_ids)
+    st.session_state.grid_version += 1 # Drop stale grid edits so they don't override the new selection
+
+def format_chat_message(comm):
+    """Renders one communication as an HTML bubble; incoming mail is left-aligned, our replies right-aligned."""
+    incoming = comm.direction == 'Incoming'
+    style = "margin:0 20% 0.75rem 0;background:rgba(128,128,128,0.12)" if incoming else "margin:0 0 0.75rem 20%;background:rgba(0,104,201,0.12)"
+    # Incoming mail is untrusted plain text: escape it, and use <br> so a blank line can't end the HTML block early. Our replies are editor HTML
+    body = html.escape(comm.body or '').replace('\r\n', '\n').replace('\n', '<br>') if incoming else comm.body
+    return f"<div style='{style};padding:0.6rem 0.8rem;border-radius:0.5rem'>{'🧑‍💻' if incoming else '🏢'} <b>From:</b> {html.escape(comm.sender or '')}<br><b>Subject:</b> {html.escape(comm.subject or 'N/A')}<hr style='margin:0.4rem 0'>{body}</div>"
+
+def extract_spreadsheet_id(url):
+    return match.group(1) if (match := _SHEET_ID_RE.search(url)) else None
 
 # Load initial data
-df = load_all_applicants()
+df, applicants_revision = load_applicants_summary()['current']
 status_list = load_statuses()
+status_index = {s: i for i, s in enumerate(status_list)}
 interviewer_list = load_interviewers()
 
 # --- App Header & Sidebar ---
@@ -65,24 +170,15 @@ st.title("HR Applicant Dashboard")
 st.markdown("Manage applicant lifecycles, from screening to hiring.")
 
 st.sidebar.header("Filter & Search")
-search_query = st.sidebar.text_input("Search by Name or Email", placeholder="e.g. Paras Kaushik")
-df_filtered = df.copy()
+search_query = st.sidebar.text_input("Search by Name or Email", placeholder="e.g. Paras Kaushik", on_change=reset_applicant_page)
+df_filtered = df
 if not df.empty:
-    status_options = ['All'] + sorted(df['Status'].unique().tolist())
-    status_filter = st.sidebar.selectbox("Filter by Status:", options=status_options)
-    if status_filter != 'All':
-        df_filtered = df_filtered[df_filtered['Status'] == status_filter]
-    domain_options = ['All'] + sorted(df['Domain'].unique().tolist())
-    domain_filter = st.sidebar.selectbox("Filter by Domain:", options=domain_options)
-    if domain_filter != 'All':
-        df_filtered = df_filtered[df_filtered['Domain'] == domain_filter]
-    if search_query:
-        df_filtered = df_filtered[
-            df_filtered['Name'].str.contains(search_query, case=False, na=False) |
-            df_filtered['Email'].str.contains(search_query, case=False, na=False)
-        ]
+    status_options, domain_options = compute_filter_options(df, applicants_revision)
+    status_filter = st.sidebar.selectbox("Filter by Status:", options=['All'] + status_options, on_change=reset_applicant_page)
+    domain_filter = st.sidebar.selectbox("Filter by Domain:", options=['All'] + domain_options, on_change=reset_applicant_page)
+    df_filtered = apply_filters(df, applicants_revision, status_filter, domain_filter, search_query)
 st.sidebar.divider()
-if st.sidebar.button("Refresh Data", use_container_width=True): st.cache_data.clear(); st.rerun()
+if st.sidebar.button("Refresh Data", use_container_width=True): refresh_database_caches(); st.rerun()
 st.sidebar.divider()
 
 # --- BULK ACTIONS SIDEBAR  ---
@@ -92,12 +188,14 @@ if num_selected > 0:
     st.sidebar.markdown(f"**{num_selected} applicant(s) for bulk action**")
     if st.sidebar.button(f"Export {num_selected} Selected to Sheet", use_container_width=True):
         with st.spinner("Generating your Google Sheet..."):
-            selected_ids = list(st.session_state.selected_applicants_bulk)
-            export_df = df[df['Id'].isin(selected_ids)]
+            export_df = db_handler.fetch_applicants_as_df(st.session_state.selected_applicants_bulk)
             columns_to_export = ['Name', 'Email', 'Phone', 'Education', 'JobHistory', 'CvUrl', 'Domain', 'Status']
-            data_to_export = export_df[columns_to_export].to_dict('records')
-            export_result = sheets_updater.create_export_sheet(data_to_export, [c.replace('JobHistory', 'Job History').replace('CvUrl', 'CV URL') for c in columns_to_export])
-            if export_result and export_result.get('url'): db_handler.insert_export_log(export_result['title'], export_result['url']); st.sidebar.success("Export successful!"); st.session_state.selected_applicants_bulk.clear(); st.rerun()
+            headers = [c.replace('JobHistory', 'Job History').replace('CvUrl', 'CV URL') for c in columns_to_export]
+            export_result = None
+            if not export_df.empty:
+                data_to_export = [headers] + export_df[columns_to_export].fillna('').astype(str).values.tolist()
+                export_result = sheets_updater.create_export_sheet(data_to_export)
+            if export_result and export_result.get('url'): db_handler.insert_export_log(export_result['title'], export_result['url']); load_export_logs.clear(); st.sidebar.success("Export successful!"); st.session_state.selected_applicants_bulk.clear(); st.rerun()
             else: st.sidebar.error("Export failed. Check logs.")
     if st.sidebar.button(f"Delete {num_selected} Selected Applicant(s)", type="primary", use_container_width=True): st.session_state.confirm_delete = True
     if st.session_state.confirm_delete:
@@ -105,7 +203,7 @@ if num_selected > 0:
         c1, c2 = st.sidebar.columns(2)
         if c1.button("✅ Yes, I'm sure", use_container_width=True, type="primary"):
             ids_to_delete = list(st.session_state.selected_applicants_bulk)
-            if db_handler.delete_applicants(ids_to_delete): st.success(f"Successfully deleted {len(ids_to_delete)} applicants."); st.session_state.selected_applicants_bulk.clear(); st.session_state.confirm_delete = False; st.session_state.selected_applicant_id = None; st.cache_data.clear(); st.rerun()
+            if db_handler.delete_applicants(ids_to_delete): st.success(f"Successfully deleted {len(ids_to_delete)} applicants."); st.session_state.selected_applicants_bulk.clear(); st.session_state.confirm_delete = False; st.session_state.selected_applicant_id = None; forget_applicants(ids_to_delete); st.rerun()
             else: st.error("An error occurred during deletion.")
         if c2.button("❌ Cancel", use_container_width=True): st.session_state.confirm_delete = False; st.rerun()
 else:
@@ -113,27 +211,25 @@ else:
 st.sidebar.divider()
 st.sidebar.header("History & Imports")
 with st.sidebar.expander("View Recent Exports"):
-    export_logs = db_handler.fetch_export_logs()
-    def delete_log_and_rerun(log_id):
-        if db_handler.delete_export_log(log_id): st.rerun()
-        else: st.error("Failed to delete the export log.")
+    export_logs = load_export_logs()
     if not export_logs.empty:
-        for _, log in export_logs.iterrows():
-            col1, col2 = st.columns([4, 1])
-            with col1: st.markdown(f"[{log['file_name']}]({log['sheet_url']})", help=f"Created on {pd.to_datetime(log['created_at']).strftime('%b %d, %H:%M')}")
-            with col2: st.button("🗑️", key=f"del_log_{log['id']}", on_click=delete_log_and_rerun, args=(log['id'],), help="Delete this export log")
+        st.markdown("\n".join(f"- [{log.file_name}]({log.sheet_url})" for log in export_logs.itertuples()))
+        log_options = {f"{log.file_name} ({log.display_date})": log.id for log in export_logs.itertuples()}
+        log_choice = st.selectbox("Export log to delete", options=list(log_options.keys()))
+        if st.button("🗑️ Delete Selected Log", use_container_width=True):
+            if db_handler.delete_export_log(log_options[log_choice]): load_export_logs.clear(); st.rerun()
+            else: st.error("Failed to delete the export log.")
     else: st.info("No recent exports found.")
 with st.sidebar.expander("Import Applicants from Sheet"):
     sheet_url = st.text_input("Paste Google Sheet URL here", placeholder="https://docs.google.com/spreadsheets/d/...")
-    def extract_spreadsheet_id(url):
-        match = re.search(r'/spreadsheets/d/([a-zA-Z0-9-_]+)', url)
-        return match.group(1) if match else None
-    if st.button("Import from Sheet"):
+    import_col, refresh_col = st.columns(2)
+    if refresh_col.button("Force refresh", help="Re-read the sheet instead of using a copy fetched in the last minute"): cached_read_sheet.clear()
+    if import_col.button("Import from Sheet"):
         if sheet_url:
             spreadsheet_id = extract_spreadsheet_id(sheet_url)
             if spreadsheet_id:
-                with st.spinner("Reading data..."): data = sheets_updater.read_sheet_data(spreadsheet_id)
-                if isinstance(data, str): st.error(data)
+                with st.spinner("Reading data..."): data = cached_read_sheet(spreadsheet_id)
+                if isinstance(data, str): cached_read_sheet.clear(spreadsheet_id); st.error(data) # Don't serve the error from cache on retry
                 elif data.empty: st.warning("No data found.")
                 else:
                     with st.spinner(f"Importing {len(data)} records..."):
@@ -142,13 +238,14 @@ with st.sidebar.expander("Import Applicants from Sheet"):
                     else:
                         st.success(f"Imported {inserted} new applicants.")
                         if skipped > 0: st.info(f"Skipped {skipped} (already exist).")
-                        st.cache_data.clear(); st.rerun()
+                        load_applicants_summary.clear(); st.rerun()
             else: st.error("Invalid Google Sheet URL.")
         else: st.warning("Please paste a URL.")
 
 
+@st.fragment
 def display_applicant_details(applicant_row):
-    """Renders the entire detail view for a given applicant."""
+    """Renders the entire detail view for a given applicant. Runs as a fragment so its widgets don't rerun the whole app."""
     row = applicant_row
     applicant_id = row['Id']
 
@@ -168,11 +265,11 @@ def display_applicant_details(applicant_row):
 
     with col2: # ACTIONS
         st.subheader("Actions")
-        current_status_index = status_list.index(row['Status']) if row['Status'] in status_list else 0
+        current_status_index = status_index.get(row['Status'], 0)
         new_status = st.selectbox("Change Status", options=status_list, index=current_status_index, key=f"status_{applicant_id}")
         if st.button("Save Status", key=f"save_{applicant_id}", use_container_width=True):
             if db_handler.update_applicant_status(applicant_id, new_status):
-                st.success(f"Status updated to '{new_status}'!"); st.cache_data.clear(); st.rerun()
+                st.success(f"Status updated to '{new_status}'!"); patch_applicant_status(applicant_id, new_status); load_applicant_full.clear(applicant_id); st.rerun(scope="app") # The list shows the status too
             else: st.error("Failed to update status.")
 
     st.divider()
@@ -187,14 +284,14 @@ def display_applicant_details(applicant_row):
     if st.session_state.get(schedule_key, False):
         with st.container(border=True):
             st.write("**Interview Scheduling**")
-            interviews = load_interviews(applicant_id)
+            interviews = load_applicant_bundle(applicant_id)['interviews']
+            interviewer_options = build_interviewer_options(interviewer_list)
             if not interviews.empty:
                 st.write("**Scheduled Interviews:**")
                 for _, interview in interviews.iterrows():
                     st.success(f"✅ {interview['event_title']} with {interview['interviewer_name']} on {interview['start_time'].strftime('%b %d, %Y at %I:%M %p')}")
 
             with st.form(f"schedule_form_{applicant_id}"):
-                interviewer_options = {f"{name} ({email})": email for name, email in zip(interviewer_list['name'], interviewer_list['email'])}
                 interviewer_display = st.selectbox("Select Interviewer", options=list(interviewer_options.keys()), key=f"sel_int_{applicant_id}")
                 duration = st.selectbox("Interview Duration (minutes)", options=[30, 45, 60], key=f"sel_dur_{applicant_id}")
                 if st.form_submit_button("1. Find Available Times", use_container_width=True):
@@ -202,43 +299,43 @@ def display_applicant_details(applicant_row):
                     st.session_state[f'schedule_duration_{applicant_id}'] = duration
                     with st.spinner("Finding open slots..."):
                         slots = calendar_handler.find_available_slots(interviewer_email=interviewer_options[interviewer_display], duration_minutes=duration)
-                        st.session_state[f'available_slots_{applicant_id}'] = slots
+                        st.session_state[f'formatted_slots_{applicant_id}'] = {s.strftime('%A, %b %d at %I:%M %p'): s for s in slots}
                         if not slots: st.warning("No available slots found for this interviewer.")
 
-            slots_key = f"available_slots_{applicant_id}"
+            slots_key = f"formatted_slots_{applicant_id}"
             if st.session_state.get(slots_key):
-                available_slots = st.session_state[slots_key]
-                formatted_slots = {s.strftime('%A, %b %d at %I:%M %p'): s for s in available_slots}
+                formatted_slots = st.session_state[slots_key]
                 selected_slots_display = st.multiselect("2. Select times to propose to applicant:", options=list(formatted_slots.keys()), key=f"multi_{applicant_id}")
                 if selected_slots_display and st.button("Prepare Email with Selected Times", key=f"prep_email_{applicant_id}"):
                     email_body = [f"Dear {row['Name']},<br><br>Following up on your application, please let us know which of the following times works for your interview:<ul>"] + [f"<li>{s}</li>" for s in selected_slots_display] + ["</ul>We look forward to hearing from you.<br><br>Best regards,<br>HR Department"]
                     st.session_state[f'email_body_{applicant_id}'] = "".join(email_body)
-                    st.session_state[f"show_hub_{applicant_id}"] = True # Auto-open the hub
-                    st.rerun()
+                    st.session_state[f"show_hub_{applicant_id}"] = True; st.session_state[f"composing_{applicant_id}"] = True # Auto-open the hub and editor
+                    st.rerun(scope="fragment")
                 
                 with st.form(f"booking_form_{applicant_id}"):
                     st.write("**3. Confirm Final Time & Book**")
-                    final_slot_options = {s.strftime('%A, %b %d at %I:%M %p'): s for s in available_slots}
-                    final_slot_display = st.selectbox("Select the confirmed time slot:", options=list(final_slot_options.keys()), key=f"final_slot_{applicant_id}")
+                    final_slot_display = st.selectbox("Select the confirmed time slot:", options=list(formatted_slots.keys()), key=f"final_slot_{applicant_id}")
                     description = st.text_area("Event Description / Notes:", key=f"desc_{applicant_id}", placeholder="e.g., First round technical interview for the Software Developer role.")
                     if st.form_submit_button("✅ Confirm & Book in Google Calendar", type="primary", use_container_width=True):
                         if not final_slot_display: st.error("Please select the final confirmed time slot.")
+                        elif st.session_state[f'schedule_interviewer_{applicant_id}'] not in interviewer_email_to_id(interviewer_list): st.error("The selected interviewer no longer exists. Please find available times again.")
                         else:
                             with st.spinner("Booking interview in Google Calendar..."):
                                 interviewer_email = st.session_state[f'schedule_interviewer_{applicant_id}']
                                 duration_val = st.session_state[f'schedule_duration_{applicant_id}']
-                                start_time = final_slot_options[final_slot_display]
+                                start_time = formatted_slots[final_slot_display]
                                 end_time = start_time + datetime.timedelta(minutes=duration_val)
-                                interviewer_details = interviewer_list[interviewer_list['email'] == interviewer_email].iloc[0]
+                                interviewer_id = interviewer_email_to_id(interviewer_list)[interviewer_email]
                                 created_event = calendar_handler.create_calendar_event(applicant_name=row['Name'], applicant_email=row['Email'], interviewer_email=interviewer_email, start_time=start_time, end_time=end_time, description=description)
                                 if created_event:
-                                    db_handler.log_interview(applicant_id=applicant_id, interviewer_id=interviewer_details['id'], title=created_event['summary'], start_time=start_time, end_time=end_time, event_id=created_event['id'])
+                                    db_handler.log_interview(applicant_id=applicant_id, interviewer_id=interviewer_id, title=created_event['summary'], start_time=start_time, end_time=end_time, event_id=created_event['id'])
+                                    load_applicant_bundle.clear(applicant_id)
                                     st.success("Interview booked! Event created in Google Calendar.")
                                     # Cleanup state
                                     keys_to_delete = [f'schedule_interviewer_{applicant_id}', f'schedule_duration_{applicant_id}', slots_key, schedule_key]
                                     for k in keys_to_delete:
                                         if k in st.session_state: del st.session_state[k]
-                                    st.rerun()
+                                    st.rerun(scope="fragment")
                                 else: st.error("Failed to create Google Calendar event.")
     st.write("") 
     # --- Part 2: Communication Hub ---
@@ -249,29 +346,33 @@ def display_applicant_details(applicant_row):
         with st.container(border=True):
             st.write("**Communication Hub**")
             with st.container(height=350):
-                conversations = db_handler.get_conversations(applicant_id)
-                if not conversations.empty:
-                    for _, comm in conversations.iterrows():
-                        role = "user" if comm['direction'] == 'Incoming' else "assistant"
-                        with st.chat_message(name=role, avatar='🧑‍💻' if role == 'user' else '🏢'):
-                             st.markdown(f"**From:** {comm['sender']}<br>**Subject:** {comm.get('subject', 'N/A')}<hr>{comm['body']}", unsafe_allow_html=True)
+                conversations = load_applicant_bundle(applicant_id)['conversations']
+                # One markdown element for the whole thread instead of a chat_message widget per message
+                if not conversations.empty: st.markdown("".join(format_chat_message(comm) for comm in conversations.itertuples()), unsafe_allow_html=True)
                 else: st.info("No communication history found.")
-            with st.form(key=f"email_form_{applicant_id}"):
-                subject = st.text_input("Subject", value=f"Re: Your application for {row['Domain']}")
-                email_content_key = f'email_body_{applicant_id}'
-                content = st_quill(value=st.session_state.get(email_content_key, f"Dear {row['Name']},<br><br>"), html=True, key=f"quill_{applicant_id}")
-                attachment = st.file_uploader("Attach a file")
-                if st.form_submit_button("Send Email", use_container_width=True):
-                    if not content or len(content) < 15: st.error("Email body is too short.")
-                    else:
-                        with st.spinner("Sending email..."):
-                            sent_message = email_handler.send_email(to=row['Email'], subject=subject, body=content, thread_id=row['GmailThreadId'], attachment=attachment)
-                            if sent_message:
-                                comm_data = {"applicant_id": applicant_id, "gmail_message_id": sent_message['id'], "sender": "HR Department", "subject": subject, "body": content, "direction": "Outgoing"}
-                                db_handler.insert_communication(comm_data)
-                                if email_content_key in st.session_state: del st.session_state[email_content_key]
-                                st.success("Email sent and logged!"); st.rerun()
-                            else: st.error("Failed to send email.")
+            compose_key = f"composing_{applicant_id}"
+            # The Quill editor is a heavy component, so it is only mounted while an email is being written
+            st.button("✉️ Write/Hide Email", key=f"compose_btn_{applicant_id}", on_click=lambda: st.session_state.update({compose_key: not st.session_state.get(compose_key, False)}))
+            if st.session_state.get(compose_key, False):
+                with st.form(key=f"email_form_{applicant_id}"):
+                    subject = st.text_input("Subject", value=f"Re: Your application for {row['Domain']}")
+                    email_content_key = f'email_body_{applicant_id}'
+                    content = st_quill(value=st.session_state.get(email_content_key, f"Dear {row['Name']},<br><br>"), html=True, key=f"quill_{applicant_id}")
+                    attachment = st.file_uploader("Attach a file")
+                    if st.form_submit_button("Send Email", use_container_width=True):
+                        if not content or len(content) < 15: st.error("Email body is too short.")
+                        else:
+                            with st.spinner("Sending email..."):
+                                sent_message = email_handler.send_email(to=row['Email'], subject=subject, body=content, thread_id=row['GmailThreadId'], attachment=attachment)
+                                if sent_message:
+                                    comm_data = {"applicant_id": applicant_id, "gmail_message_id": sent_message['id'], "sender": "HR Department", "subject": subject, "body": content, "direction": "Outgoing"}
+                                    db_handler.insert_communication(comm_data)
+                                    load_applicant_bundle.clear(applicant_id)
+                                    if email_content_key in st.session_state: del st.session_state[email_content_key]
+                                    st.session_state[compose_key] = False
+                                    st.success("Email sent and logged!"); st.rerun(scope="fragment")
+                                else: st.error("Failed to send email.")
+            elif st.session_state.get(f'email_body_{applicant_id}'): st.caption("A draft with the proposed interview times is waiting in the editor.")
 
 
 # --- Main Dashboard Display ---
@@ -285,34 +386,49 @@ with tab1:
 
         with list_col:
             st.subheader(f"Displaying {len(df_filtered)} Applicants")
-            st.caption("Select an applicant to view details.")
+            st.caption("Tick **View** on an applicant to see their details.")
+
+            # Only the current page is sent to the grid so payload and rerun cost stay flat as applicants grow
+            page_count = -(-len(df_filtered) // APPLICANTS_PAGE_SIZE)
+            page = min(st.session_state.applicant_page, page_count - 1)
+            page_df = df_filtered.iloc[page * APPLICANTS_PAGE_SIZE:(page + 1) * APPLICANTS_PAGE_SIZE]
 
             # --- Bulk selection logic ---
-            filtered_ids = set(df_filtered['Id'])
-            def handle_select_all():
-                if st.session_state.get('select_all_visible_checkbox', False): st.session_state.selected_applicants_bulk.update(filtered_ids)
-                else: st.session_state.selected_applicants_bulk.difference_update(filtered_ids)
-            
-            is_all_selected = filtered_ids.issubset(st.session_state.selected_applicants_bulk) and bool(filtered_ids)
-            st.checkbox("Select/Deselect All Visible", value=is_all_selected, key='select_all_visible_checkbox', on_change=handle_select_all)
+            grid_df = page_df[['Id', 'Name', 'Domain', 'Status', 'Email']].assign(
+                Select=page_df['Id'].isin(st.session_state.selected_applicants_bulk),
+                View=page_df['Id'] == st.session_state.selected_applicant_id
+            )
+            st.checkbox("Select/Deselect All on Page", value=bool(grid_df['Select'].all()), key='select_all_visible_checkbox', on_change=toggle_select_all, args=(grid_df['Id'].tolist(),))
             st.divider()
 
-            with st.container(height=800):
-                for _, row in df_filtered.iterrows():
-                    applicant_id = row['Id']
-                    item_cols = st.columns([1, 5])
-                    with item_cols[0]:
-                        st.checkbox("", value=(applicant_id in st.session_state.selected_applicants_bulk), key=f"bulk_select_{applicant_id}", on_change=lambda aid=applicant_id: st.session_state.selected_applicants_bulk.add(aid) if f"bulk_select_{aid}" not in st.session_state.selected_applicants_bulk else st.session_state.selected_applicants_bulk.remove(aid))
-                    with item_cols[1]:
-                        if st.button(f"**{row['Name']}**\n\n_{row['Domain']} | {row['Status']}_", key=f"view_{applicant_id}", use_container_width=True):
-                            if st.session_state.selected_applicant_id != applicant_id:
-                                clear_applicant_specific_state() # Clear old state before setting new
-                                st.session_state.selected_applicant_id = applicant_id
-                                st.rerun()
+            # One editable grid instead of a checkbox + button widget per applicant
+            edited = st.data_editor(
+                grid_df, key=f"applicant_grid_{st.session_state.grid_version}", height=800, hide_index=True, use_container_width=True,
+                column_order=['Select', 'View', 'Name', 'Domain', 'Status', 'Email'], disabled=['Id', 'Name', 'Domain', 'Status', 'Email'],
+                column_config={'Select': st.column_config.CheckboxColumn("Bulk", help="Select for bulk actions", width="small"),
+                               'View': st.column_config.CheckboxColumn("View", help="Show this applicant's details", width="small")}
+            )
+            select_changed = edited['Select'] != grid_df['Select']
+            view_changed = edited['View'] != grid_df['View']
+            if select_changed.any() or view_changed.any():
+                st.session_state.selected_applicants_bulk.update(edited.loc[select_changed & edited['Select'], 'Id'].tolist())
+                st.session_state.selected_applicants_bulk.difference_update(edited.loc[select_changed & ~edited['Select'], 'Id'].tolist())
+                if view_changed.any():
+                    opened_ids = edited.loc[view_changed & edited['View'], 'Id'].tolist()
+                    clear_applicant_specific_state() # Clear old state before setting new
+                    st.session_state.selected_applicant_id = opened_ids[0] if opened_ids else None
+                st.session_state.grid_version += 1
+                st.rerun()
+
+            if page_count > 1:
+                prev_col, page_col, next_col = st.columns([1, 2, 1])
+                if prev_col.button("◀ Prev", disabled=page == 0, use_container_width=True): st.session_state.applicant_page = page - 1; st.rerun()
+                page_col.caption(f"Page {page + 1} of {page_count}")
+                if next_col.button("Next ▶", disabled=page == page_count - 1, use_container_width=True): st.session_state.applicant_page = page + 1; st.rerun()
 
         with detail_col:
-            if st.session_state.selected_applicant_id:
-                selected_applicant_row = df[df['Id'] == st.session_state.selected_applicant_id].iloc[0]
+            selected_applicant_row = load_applicant_full(st.session_state.selected_applicant_id) if st.session_state.selected_applicant_id in df.index else None
+            if selected_applicant_row:
                 display_applicant_details(selected_applicant_row)
             else:
                 st.info("⬅️ Select an applicant from the list to see their details here.")
@@ -333,13 +449,13 @@ with tab2:
                     if c2.button("🗑️", key=f"del_status_{status}", help=f"Delete '{status}' status", use_container_width=True):
                         error_msg = db_handler.delete_status(status)
                         if error_msg: st.error(error_msg)
-                        else: st.success(f"Status '{status}' deleted."); st.cache_data.clear(); st.rerun()
+                        else: st.success(f"Status '{status}' deleted."); load_statuses.clear(); st.rerun()
             
             with st.form("new_status_form", clear_on_submit=True):
                 new_status_name = st.text_input("Add a new status")
                 if st.form_submit_button("Add Status", use_container_width=True):
                     if new_status_name:
-                        if db_handler.add_status(new_status_name): st.success(f"Status '{new_status_name}' added."); st.cache_data.clear(); st.rerun()
+                        if db_handler.add_status(new_status_name): st.success(f"Status '{new_status_name}' added."); load_statuses.clear(); st.rerun()
                         else: st.warning(f"Status '{new_status_name}' already exists.")
 
         with col_interviewer:
@@ -349,7 +465,7 @@ with tab2:
                     c1, c2 = st.columns([4, 1])
                     c1.text(f"{interviewer['name']} ({interviewer['email']})")
                     if c2.button("🗑️", key=f"del_interviewer_{interviewer['id']}", help=f"Delete {interviewer['name']}", use_container_width=True):
-                        if db_handler.delete_interviewer(interviewer['id']): st.success(f"Interviewer '{interviewer['name']}' deleted."); st.cache_data.clear(); st.rerun()
+                        if db_handler.delete_interviewer(interviewer['id']): st.success(f"Interviewer '{interviewer['name']}' deleted."); load_interviewers.clear(); load_applicant_bundle.clear(); st.rerun()
                         else: st.error("Could not delete interviewer.")
             
             with st.form("new_interviewer_form", clear_on_submit=True):
@@ -358,6 +474,6 @@ with tab2:
                 new_interviewer_email = st.text_input("Google Account Email", key="new_interviewer_email_input")
                 if st.form_submit_button("Add Interviewer", use_container_width=True):
                     if new_interviewer_name and new_interviewer_email:
-                        if db_handler.add_interviewer(new_interviewer_name, new_interviewer_email): st.success(f"Interviewer '{new_interviewer_name}' added."); st.cache_data.clear(); st.rerun()
+                        if db_handler.add_interviewer(new_interviewer_name, new_interviewer_email): st.success(f"Interviewer '{new_interviewer_name}' added."); load_interviewers.clear(); st.rerun()
                         else: st.warning("Interviewer with that email already exists.")
                     else: st.warning("Please provide both name and email.")
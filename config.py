@@ -1,4 +1,5 @@
 import os
+from zoneinfo import ZoneInfo
 from dotenv import load_dotenv
 
 load_dotenv()  # Load environment variables from .env file
@@ -6,6 +7,7 @@ load_dotenv()  # Load environment variables from .env file
 
 SPREADSHEET_ID = os.getenv("SPREADSHEET_ID")
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
+LOCAL_TZ = ZoneInfo("Asia/Kolkata") # The office's time zone: working hours, interview times and displayed dates
 
 # --- Database Credentials ---
 DB_NAME = os.getenv("DB_NAME")
@@ -14,6 +16,12 @@ DB_PASSWORD = os.getenv("DB_PASSWORD")
 DB_HOST = os.getenv("DB_HOST")
 DB_PORT = os.getenv("DB_PORT")
 
+# Connection pool sizing; connections older than DB_POOL_RECYCLE seconds are replaced on checkout.
+# The pool closes returned connections beyond DB_POOL_MIN_CONN idle ones, so set it to the expected number of concurrent users
+DB_POOL_MIN_CONN = int(os.getenv("DB_POOL_MIN_CONN", 5))
+DB_POOL_MAX_CONN = int(os.getenv("DB_POOL_MAX_CONN", 10))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", 1800))
+
 # Google API Scopes
 SCOPES = [
     'https://www.googleapis.com/auth/gmail.readonly',
@@ -25,8 +33,26 @@ SCOPES = [
 
 # App Settings
 CHECK_INTERVAL = 120  
-TEMP_DIR = "temp"
+PROCESSED_IDS_MEMORY_LIMIT = 100_000 # Most recent handled Gmail message ids kept in memory; all of them are persisted
+# Gmail push notifications (optional, needs google-cloud-pubsub from requirements-optional.txt): with both set, new mail wakes the worker instead of it polling every CHECK_INTERVAL
+GMAIL_PUBSUB_TOPIC = os.getenv("GMAIL_PUBSUB_TOPIC") # projects/<project>/topics/<topic>
+GMAIL_PUBSUB_SUBSCRIPTION = os.getenv("GMAIL_PUBSUB_SUBSCRIPTION") # projects/<project>/subscriptions/<subscription>
+PUSH_SAFETY_POLL_INTERVAL = 600
+GMAIL_WATCH_RENEW_INTERVAL = 6 * 24 * 3600 # Gmail watches expire after 7 days
+# Optional Drive folder shared as "anyone with the link can view"; resumes uploaded into it need no per-file permission call
+DRIVE_UPLOAD_FOLDER_ID = os.getenv("DRIVE_UPLOAD_FOLDER_ID")
 OPENAI_MODEL = "gpt-3.5-turbo-1106"
+# Passes that find at least this many new applications extract them through the OpenAI Batch API (half price, results within 24h)
+OPENAI_BATCH_THRESHOLD = 20
+OPENAI_MAX_WORKERS = 4 # Applications extracted at once, and the cap on chat requests in flight across all of them; the OpenAI client retries 429s with backoff
+OPENAI_RESUME_TOKEN_BUDGET = 3000 # Resume tokens sent per extraction request; longer resumes are cut off, bounding latency and cost
+# Local runtime state; holds applicant personal data, so it stays out of the repository (see .gitignore)
+DATA_DIR = os.getenv("DATA_DIR", "data")
+AI_CACHE_PATH = os.path.join(DATA_DIR, "ai_cache.sqlite3") # Extraction results keyed by a hash of model, prompts and input text
+# Opt-in: set to a sentence-transformers model (e.g. all-MiniLM-L6-v2, see requirements-embeddings.txt) to classify Domain
+# as the role label closest to the resume in its embedding space. Unset, Domain is classified by the LLM.
+DOMAIN_EMBEDDING_MODEL = os.getenv("DOMAIN_EMBEDDING_MODEL")
+DOMAIN_MIN_SIMILARITY = 0.35 # Not yet validated against LLM labels; below it the resume is classified as 'Other'
 SHEET_COLUMNS = [
     "Name", "Email", "Phone", "Education",
     "Domain", "Job History", "CV_URL", "Status"
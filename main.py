@@ -1,12 +1,16 @@
 import time
-from config import CHECK_INTERVAL
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from config import CHECK_INTERVAL, PROCESSED_IDS_MEMORY_LIMIT, GMAIL_PUBSUB_TOPIC, GMAIL_PUBSUB_SUBSCRIPTION, PUSH_SAFETY_POLL_INTERVAL, GMAIL_WATCH_RENEW_INTERVAL, OPENAI_BATCH_THRESHOLD, OPENAI_MAX_WORKERS
 from utils.logger import logger
-from utils.file_utils import setup_temp_dir
 from modules.email_handler import EmailHandler
 from modules.drive_handler import DriveHandler
 from modules.pdf_processor import FileProcessor
 from modules.ai_classifier import AIClassifier
 from modules.database_handler import DatabaseHandler
+try: from google.cloud import pubsub_v1
+except ImportError: pubsub_v1 = None
 
 class HRClassifier:
     def __init__(self):
@@ -15,25 +19,74 @@ class HRClassifier:
         self.file_processor = FileProcessor()
         self.ai_classifier = AIClassifier()
         self.db_handler = DatabaseHandler()
-        self.processed_message_ids = set()
+        # Bounded LRU of handled message ids, seeded from (and mirrored to) the processed_messages table so restarts don't redo work
+        self.processed_message_ids = OrderedDict()
+        self.pending_batches = {} # batch id -> {msg_id: (email_data, attachment, resume_text), or None if only the id survived a restart}
+        self.mail_event = threading.Event()
+        self.streaming_pull = None
+        self.watch_renewed_at = 0
+        # Resume uploads run in the background while the text and AI extraction proceed; one worker keeps the Drive client single-threaded
+        self.upload_pool = ThreadPoolExecutor(max_workers=1)
+
+    def start_push_notifications(self):
+        """Subscribes to Gmail push notifications. Returns False (keep polling) if they are not configured or unavailable."""
+        if not (GMAIL_PUBSUB_TOPIC and GMAIL_PUBSUB_SUBSCRIPTION): return False
+        if pubsub_v1 is None:
+            logger.warning("GMAIL_PUBSUB_* is set but google-cloud-pubsub is not installed; falling back to polling.")
+            return False
+        if not self.renew_watch(): return False
+
+        def on_notification(message):
+            message.ack(); self.mail_event.set()
+        self.streaming_pull = pubsub_v1.SubscriberClient().subscribe(GMAIL_PUBSUB_SUBSCRIPTION, callback=on_notification)
+        logger.info(f"Listening for Gmail notifications on {GMAIL_PUBSUB_SUBSCRIPTION}")
+        return True
+
+    def renew_watch(self):
+        if not self.email_handler.watch_mailbox(GMAIL_PUBSUB_TOPIC): return False
+        self.watch_renewed_at = time.monotonic()
+        return True
 
     def run(self):
         logger.info("Starting HR Email Classifier")
         self.db_handler.create_tables()
+        self.processed_message_ids = OrderedDict.fromkeys(self.db_handler.get_recent_processed_message_ids(PROCESSED_IDS_MEMORY_LIMIT))
+        # Batches submitted before a restart are collected rather than resubmitted; their applications are fetched again once results arrive
+        for batch_id, msg_ids in self.db_handler.get_pending_batches().items():
+            self.pending_batches[batch_id] = dict.fromkeys(msg_ids)
+            for msg_id in msg_ids: self.mark_processed(msg_id, persist=False)
+        push_enabled = self.start_push_notifications()
+        # With push enabled the timeout is only a safety net for dropped notifications
+        wait_interval = PUSH_SAFETY_POLL_INTERVAL if push_enabled else CHECK_INTERVAL
         try:
             while True:
+                # Cleared before processing so mail arriving mid-pass triggers another pass
+                self.mail_event.clear()
+
                 # 1. Process brand-new application emails
                 self.process_new_applications()
+                self.collect_batch_results()
                 
                 # 2. Process replies in ongoing conversations
                 self.process_replies()
                 
-                logger.info(f"Waiting for {CHECK_INTERVAL} seconds before next check...")
-                time.sleep(CHECK_INTERVAL)
+                if push_enabled and time.monotonic() - self.watch_renewed_at > GMAIL_WATCH_RENEW_INTERVAL: self.renew_watch()
+
+                logger.info(f"Waiting up to {wait_interval} seconds for new mail...")
+                self.mail_event.wait(wait_interval)
         except KeyboardInterrupt:
             logger.info("Application stopped by user.")
         except Exception as e:
             logger.critical(f"A critical error occurred in the main loop: {str(e)}", exc_info=True)
+        finally:
+            if self.streaming_pull: self.streaming_pull.cancel()
+            self.upload_pool.shutdown(wait=True)
+
+    def mark_processed(self, msg_id, persist=True):
+        self.processed_message_ids[msg_id] = None
+        self.processed_message_ids.move_to_end(msg_id)
+        if len(self.processed_message_ids) > PROCESSED_IDS_MEMORY_LIMIT: self.processed_message_ids.popitem(last=False)
+        if persist: self.db_handler.mark_message_processed(msg_id)
 
     def process_new_applications(self):
         logger.info("Checking for new applications...")
@@ -41,67 +94,146 @@ class HRClassifier:
         if not messages:
             logger.info("No new applications found.")
             return
-        for msg in messages:
-            if msg['id'] in self.processed_message_ids: continue
-            self.process_single_email(msg['id'])
-            self.processed_message_ids.add(msg['id'])
+        new_ids = [msg['id'] for msg in messages if msg['id'] not in self.processed_message_ids]
+        if len(new_ids) >= OPENAI_BATCH_THRESHOLD: self.queue_batch(new_ids); return
+        prepared = self.prepare_applications(new_ids)
+        # The LLM calls dominate a pass, so only they run concurrently; the Gmail/Drive clients are not thread-safe
+        with ThreadPoolExecutor(max_workers=OPENAI_MAX_WORKERS) as executor:
+            extracted = list(executor.map(self.extract_application, prepared.items()))
+        for (msg_id, application), ai_data in zip(prepared.items(), extracted): self.store_application(msg_id, *application, ai_data=ai_data)
+
+    def extract_application(self, item):
+        """Runs the AI extraction for one prepared (msg_id, application); a failure is logged and yields {} so the rest of the pass continues."""
+        msg_id, (email_data, _, resume_text) = item
+        try: return self.ai_classifier.extract_info(email_data['subject'], email_data['body'], resume_text)
+        except Exception as e:
+            logger.error(f"AI extraction failed for email {msg_id}: {str(e)}", exc_info=True)
+            return {}
+
+    def prepare_applications(self, msg_ids, upload=True):
+        """Runs prepare_application for each message, returning {msg_id: (email_data, drive_url future or attachment, resume_text)}."""
+        prepared = {}
+        for msg_id in msg_ids:
+            logger.info(f"Processing new application with email ID: {msg_id}")
+            try:
+                application = self.prepare_application(msg_id, upload)
+                if application: prepared[msg_id] = application
+            except Exception as e:
+                logger.error(f"Failed to prepare email {msg_id}: {str(e)}", exc_info=True)
+            # Not persisted: an application stays unread until it is stored, so after a restart it should be picked up again
+            self.mark_processed(msg_id, persist=False)
+        return prepared
+
+    def queue_batch(self, msg_ids):
+        """Extracts text for a backlog of applications, then hands the AI extraction to one Batch API job.
+        Resumes are uploaded only when the results are stored, so a restart in between leaves no duplicate files in Drive."""
+        prepared = self.prepare_applications(msg_ids, upload=False)
+        # Applications extracted before (reposts, retries) are stored straight from the AI cache
+        for msg_id in [msg_id for msg_id, (email_data, _, resume_text) in prepared.items() if self.ai_classifier.is_cached(email_data['subject'], email_data['body'], resume_text)]:
+            email_data, attachment, resume_text = prepared.pop(msg_id)
+            self.store_application(msg_id, email_data, self.start_upload(attachment), resume_text)
+        if not prepared: return
+        batch_id = self.ai_classifier.submit_batch({msg_id: (email_data['subject'], email_data['body'], resume_text) for msg_id, (email_data, _, resume_text) in prepared.items()})
+        if batch_id:
+            self.db_handler.add_pending_batch(batch_id, list(prepared)); self.pending_batches[batch_id] = prepared
+        else:
+            for msg_id, (email_data, attachment, resume_text) in prepared.items(): self.store_application(msg_id, email_data, self.start_upload(attachment), resume_text)
+
+    def collect_batch_results(self):
+        """Stores applicants from finished extraction batches; requests that failed in the batch are retried live."""
+        for batch_id in list(self.pending_batches):
+            results = self.ai_classifier.fetch_batch_results(batch_id)
+            if results is None: continue
+            applications = self.pending_batches.pop(batch_id)
+            # Batches reloaded after a restart only know their message ids
+            applications.update(self.prepare_applications([msg_id for msg_id, application in applications.items() if application is None], upload=False))
+            for msg_id, application in applications.items():
+                if application is None: continue # No longer fetchable; logged by prepare_applications
+                email_data, attachment, resume_text = application
+                ai_data = results.get(msg_id)
+                # Fields found by the regex fast path were left out of the batch requests
+                if ai_data is not None:
+                    ai_data = {**ai_data, **self.ai_classifier.quick_extract(resume_text)}
+                    self.ai_classifier.remember(email_data['subject'], email_data['body'], resume_text, ai_data)
+                self.store_application(msg_id, email_data, self.start_upload(attachment), resume_text, ai_data=ai_data)
+            self.db_handler.remove_pending_batch(batch_id)
 
     def process_replies(self):
         logger.info("Checking for replies in active threads...")
         active_threads = self.db_handler.get_active_threads()
+        # IDs of messages already in our DB, for every active applicant in one query
+        known_ids_by_applicant = self.db_handler.get_known_message_ids([applicant_id for applicant_id, _ in active_threads])
         
+        # Threads, then the new messages across all of them, are fetched in batched Gmail round trips
+        threads = self.email_handler.fetch_threads([thread_id for _, thread_id in active_threads if thread_id])
+        new_messages = {} # msg_id -> applicant_id
         for applicant_id, thread_id in active_threads:
-            messages_in_thread = self.email_handler.fetch_new_messages_in_thread(thread_id)
-            
-            # Get IDs of messages already in our DB for this applicant
-            convos = self.db_handler.get_conversations(applicant_id)
-            known_ids = set(convos['gmail_message_id'].tolist()) if not convos.empty else set()
-
-            for msg_summary in messages_in_thread:
+            known_ids = known_ids_by_applicant.get(applicant_id, set())
+            for msg_summary in threads.get(thread_id, []):
                 msg_id = msg_summary['id']
                 if msg_id in known_ids or msg_id in self.processed_message_ids:
                     continue
+                new_messages[msg_id] = applicant_id
+        if not new_messages: return
 
-                email_data = self.email_handler.get_email_content(msg_id)
-                if not email_data:
-                    self.processed_message_ids.add(msg_id)
-                    continue
-                
-                comm_data = {
-                    "applicant_id": applicant_id, "gmail_message_id": email_data['id'],
-                    "sender": email_data['sender'], "subject": email_data['subject'],
-                    "body": email_data['body'], "direction": "Incoming"
-                }
-                
-                self.db_handler.insert_communication(comm_data)
-                self.processed_message_ids.add(msg_id)
-                logger.info(f"New reply from applicant {applicant_id} (message: {msg_id}) has been saved.")
+        contents = self.email_handler.get_email_contents(new_messages)
+        replies = []
+        for msg_id, applicant_id in new_messages.items():
+            if msg_id not in contents: continue # Fetch failed; retried on the next pass
+            email_data = contents[msg_id]
+            if not email_data:
+                self.mark_processed(msg_id)
+                continue
+            
+            replies.append({
+                "applicant_id": applicant_id, "gmail_message_id": email_data['id'],
+                "sender": email_data['sender'], "subject": email_data['subject'],
+                "body": email_data['body'], "direction": "Incoming"
+            })
+        if not replies: return
 
-    def process_single_email(self, msg_id):
-        logger.info(f"Processing new application with email ID: {msg_id}")
-        try:
-            email_data = self.email_handler.get_email_content(msg_id)
-            if not email_data: return
+        # All replies and their processed markers are written together; on failure none are marked, so the next pass retries them
+        if not self.db_handler.insert_replies(replies): return
+        for comm_data in replies:
+            self.mark_processed(comm_data['gmail_message_id'], persist=False)
+            logger.info(f"New reply from applicant {comm_data['applicant_id']} (message: {comm_data['gmail_message_id']}) has been saved.")
 
-            file_path = self.email_handler.save_attachment(msg_id)
-            if not file_path:
-                logger.warning(f"No processable attachment in email {msg_id}. Skipping.")
-                self.email_handler.mark_as_read(msg_id)
-                return
+    def prepare_application(self, msg_id, upload=True):
+        """Fetches the email, starts its resume upload and extracts the text. Returns (email_data, drive_url future, resume_text) or None.
+        With upload=False the (file_name, file_data) attachment takes the place of the future, for start_upload later."""
+        email_data = self.email_handler.get_email_content(msg_id)
+        if not email_data: return None
+
+        attachment = self.email_handler.get_attachment(msg_id)
+        if not attachment:
+            logger.warning(f"No processable attachment in email {msg_id}. Skipping.")
+            self.email_handler.mark_as_read(msg_id)
+            return None
 
-            drive_url = self.drive_handler.upload_to_drive(file_path)
-            resume_text = self.file_processor.extract_text(file_path)
+        # The attachment stays in memory: both the upload and the text extraction read the same bytes
+        file_name, file_data = attachment
+        drive_url = self.start_upload(attachment) if upload else attachment
+        resume_text = self.file_processor.extract_text(file_name, file_data)
+        return email_data, drive_url, resume_text
 
-            ai_data = self.ai_classifier.extract_info(email_data['subject'], email_data['body'], resume_text)
+    def start_upload(self, attachment):
+        """Queues a (file_name, file_data) resume for upload to Drive; returns a future for its URL."""
+        return self.upload_pool.submit(self.drive_handler.upload_to_drive, *attachment)
+
+    def store_application(self, msg_id, email_data, drive_url, resume_text, ai_data=None):
+        """Saves the applicant, running the AI extraction live unless batch results are supplied."""
+        try:
+            if ai_data is None: ai_data = self.ai_classifier.extract_info(email_data['subject'], email_data['body'], resume_text)
             
-            applicant_data = {**ai_data, 'Email': email_data['sender'], 'CV_URL': drive_url}
+            # Resolved only after the extraction, so the upload overlaps the LLM call
+            applicant_data = {**ai_data, 'Email': email_data['sender'], 'CV_URL': drive_url.result()}
             
             applicant_id = self.db_handler.insert_applicant_and_communication(applicant_data, email_data)
             
             if applicant_id:
                 self.email_handler.mark_as_read(msg_id)
         except Exception as e:
-            logger.error(f"Failed to process email {msg_id}: {str(e)}", exc_info=True)
+            logger.error(f"Failed to store application from email {msg_id}: {str(e)}", exc_info=True)
 
 if __name__ == "__main__":
     classifier = HRClassifier()
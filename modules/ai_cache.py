@@ -0,0 +1,29 @@
+import json
+import os
+import sqlite3
+import threading
+from config import AI_CACHE_PATH
+from utils.logger import logger
+
+class AICache:
+    """Content-addressed store of AI extraction results, kept in a local SQLite file so it survives restarts."""
+    def __init__(self, path=AI_CACHE_PATH):
+        # Cached results include names, phone numbers and job history, so the directory is private to this user
+        os.makedirs(os.path.dirname(path) or '.', mode=0o700, exist_ok=True)
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.lock = threading.Lock() # Extraction runs on worker threads; one connection is shared behind this lock
+        with self.lock, self.conn:
+            self.conn.execute("CREATE TABLE IF NOT EXISTS extractions (key TEXT PRIMARY KEY, result TEXT NOT NULL);")
+
+    def get(self, key):
+        try:
+            with self.lock: row = self.conn.execute("SELECT result FROM extractions WHERE key = ?;", (key,)).fetchone()
+            return json.loads(row[0]) if row else None
+        except sqlite3.Error as e:
+            logger.error(f"AI cache read failed: {e}"); return None
+
+    def set(self, key, result):
+        try:
+            with self.lock, self.conn: self.conn.execute("INSERT OR REPLACE INTO extractions (key, result) VALUES (?, ?);", (key, json.dumps(result)))
+        except sqlite3.Error as e:
+            logger.error(f"AI cache write failed: {e}")
\ No newline at end of file
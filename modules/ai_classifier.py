@@ -1,63 +1,214 @@
 import openai
 import re
 import json
-from config import OPENAI_API_KEY, OPENAI_MODEL
+import hashlib
+import threading
+from concurrent.futures import ThreadPoolExecutor
+try: import orjson # Optional: several times faster than json for decoding model responses
+except ImportError: orjson = None
+try: from sentence_transformers import SentenceTransformer # Optional: classifies Domain locally instead of through the LLM
+except ImportError: SentenceTransformer = None
+try: import tiktoken # Optional: exact token counts for the resume budget
+except ImportError: tiktoken = None
+from config import OPENAI_API_KEY, OPENAI_MODEL, DOMAIN_EMBEDDING_MODEL, DOMAIN_MIN_SIMILARITY, OPENAI_RESUME_TOKEN_BUDGET, OPENAI_MAX_WORKERS
+from modules.ai_cache import AICache
 from utils.logger import logger
+from utils.resume_sections import split_sections, resume_snippet
+
+COMPANY_ROLES = [
+    "LLM engineer", "AI/ML engineer", "SEO", "Full Stack Developer",
+    "Project manager", "content writer", "digital marketing",
+    "software developer", "UI/UX", "App developer", "graphic designer",
+    "videographer", "BDE(business developer executive)", "HR", "PPC"
+]
+
+FIELD_INSTRUCTIONS = {
+    'Name': "Full name of the applicant.",
+    'Phone': "The 10-digit mobile number as a plain string of digits.",
+    'Education': "A single-string summary of their education background.",
+    'JobHistory': "Create a markdown-formatted bulleted list. Each bullet point, starting with a hyphen (-), should represent a single job, including the Job Title, Company, and a 1-sentence summary of responsibilities.",
+    'Domain': f"Analyze the entire text and classify the candidate's primary role into ONE of the following: {', '.join(COMPANY_ROLES)}. Base your decision on their most recent and significant experience. If no role is a clear match, use 'Other'.",
+}
+
+# Extraction is split into small independent requests that run in parallel.
+# task -> (fields, max_tokens, resume sections sent with the request)
+EXTRACTION_TASKS = {
+    'basic': (('Name', 'Phone', 'Education'), 300, ('header', 'education')),
+    'jobs': (('JobHistory',), 1000, ('experience',)),
+    'domain': (('Domain',), 50, ('header', 'experience')),
+}
+
+# Deterministic fast path for fields with a reliable textual shape; the LLM is only asked for what these miss
+PHONE_RE = re.compile(r'(?<!\d)(?:\+?\d{1,3}[\s-]?)?(\d{5}[\s-]?\d{5}|\d{3}[\s-]?\d{3}[\s-]?\d{4})(?!\d)')
+# A number only counts as the phone when a phone label directly precedes it, or it opens a header line or follows a separator there
+PHONE_LABEL_RE = re.compile(r'\b(?:phone|mobile|mob|cell|contact|tel|ph|whatsapp)\b(?:\s*(?:no|number)\b)?\.?\s*[:.-]?\s*$', re.I)
+HEADER_SEPARATOR_RE = re.compile(r'(?:^|[|,/])\s*$')
+CODE_FENCE_RE = re.compile(r'^\s*```(?:json)?\s*(.*?)\s*```\s*$', re.S)
+CHARS_PER_TOKEN = 4 # Rough English average, used to size the budget when tiktoken is unavailable
+DOMAIN_TEXT_LIMIT = 2000 # Characters of the header and experience sections embedded for Domain classification
+
+SYSTEM_PROMPT = "You are a hyper-precise HR data extraction engine. From the provided text, extract a valid JSON object with the exact following keys:\n"
+
+# Part of every cache key, so editing a prompt, task definition, fast-path pattern or the Domain classifier invalidates earlier results
+PROMPT_VERSION = hashlib.sha256(repr((
+    SYSTEM_PROMPT, FIELD_INSTRUCTIONS, EXTRACTION_TASKS, OPENAI_RESUME_TOKEN_BUDGET,
+    PHONE_RE.pattern, PHONE_LABEL_RE.pattern, HEADER_SEPARATOR_RE.pattern, DOMAIN_EMBEDDING_MODEL, DOMAIN_MIN_SIMILARITY
+)).encode('utf-8')).hexdigest()[:12]
 
 class AIClassifier:
     def __init__(self):
         openai.api_key = OPENAI_API_KEY
         self.model = OPENAI_MODEL
+        self.cache = AICache()
+        # Shared by every extract_info call, so the per-application pools together never exceed OPENAI_MAX_WORKERS requests in flight
+        self.request_slots = threading.BoundedSemaphore(OPENAI_MAX_WORKERS)
+        self.encoding = None
+        if tiktoken:
+            try: self.encoding = tiktoken.encoding_for_model(self.model)
+            except Exception as e: logger.warning(f"No tiktoken encoding for '{self.model}', resumes are truncated by length: {str(e)}")
+        self.embedder, self.role_embeddings = None, None
+        if DOMAIN_EMBEDDING_MODEL and not SentenceTransformer: logger.warning("DOMAIN_EMBEDDING_MODEL is set but sentence-transformers is not installed, Domain will be classified by the LLM.")
+        elif DOMAIN_EMBEDDING_MODEL:
+            try:
+                self.embedder = SentenceTransformer(DOMAIN_EMBEDDING_MODEL)
+                self.role_embeddings = self.embedder.encode(COMPANY_ROLES, normalize_embeddings=True)
+            except Exception as e:
+                self.embedder = None
+                logger.warning(f"Could not load embedding model '{DOMAIN_EMBEDDING_MODEL}', Domain will be classified by the LLM: {str(e)}")
+
+    def _cache_key(self, email_subject, email_body, resume_text):
+        return hashlib.sha256("\x00".join((self.model, PROMPT_VERSION, email_subject or '', email_body or '', resume_text or '')).encode('utf-8')).hexdigest()
+
+    def is_cached(self, email_subject, email_body, resume_text):
+        return self.cache.get(self._cache_key(email_subject, email_body, resume_text)) is not None
+
+    def remember(self, email_subject, email_body, resume_text, result):
+        """Caches a complete extraction; partial results (a task failed) are not kept so they get retried."""
+        if all(field in result for field in FIELD_INSTRUCTIONS): self.cache.set(self._cache_key(email_subject, email_body, resume_text), result)
+
+    def classify_domain(self, resume_text, sections):
+        """Picks the role whose embedding is closest to the resume's; 'Other' below DOMAIN_MIN_SIMILARITY."""
+        text = resume_snippet(sections, ('header', 'experience'), resume_text)[:DOMAIN_TEXT_LIMIT]
+        similarities = self.role_embeddings @ self.embedder.encode(text, normalize_embeddings=True)
+        best = int(similarities.argmax())
+        return COMPANY_ROLES[best] if similarities[best] >= DOMAIN_MIN_SIMILARITY else 'Other'
+
+    def _find_phone(self, resume_text, sections):
+        """Returns the digits of a labelled phone number anywhere, else of an unlabelled one in the header, or None."""
+        for lines, prefix_re in ((resume_text.split('\n'), PHONE_LABEL_RE), (sections.get('header', '').split('\n'), HEADER_SEPARATOR_RE)):
+            for line in lines:
+                for match in PHONE_RE.finditer(line):
+                    if prefix_re.search(line[:match.start()]): return re.sub(r'\D', '', match.group(1))
+        return None
+
+    def quick_extract(self, resume_text, sections=None):
+        """Pulls the phone number and, with an embedding model, the domain without calling the LLM."""
+        sections = split_sections(resume_text) if sections is None else sections
+        fields = {}
+        if phone := self._find_phone(resume_text, sections): fields['Phone'] = phone
+        if self.embedder and resume_text.strip(): fields['Domain'] = self.classify_domain(resume_text, sections)
+        return fields
+
+    def _truncate(self, text, max_tokens=OPENAI_RESUME_TOKEN_BUDGET):
+        """Cuts text to at most max_tokens tokens (estimated from its length without tiktoken)."""
+        if not self.encoding: return text[:max_tokens * CHARS_PER_TOKEN]
+        tokens = self.encoding.encode(text, disallowed_special=())
+        return self.encoding.decode(tokens[:max_tokens]) if len(tokens) > max_tokens else text
+
+    def _request_body(self, task, email_subject, email_body, resume_text, sections, known_fields=()):
+        """Builds the chat-completions request for one extraction task, or None if every field is already known."""
+        fields, max_tokens, wanted_sections = EXTRACTION_TASKS[task]
+        fields = [field for field in fields if field not in known_fields]
+        if not fields: return None
+        instructions = "".join(f"- '{field}': {FIELD_INSTRUCTIONS[field]}\n" for field in fields)
+        combined_text = (
+            f"EMAIL SUBJECT: {email_subject}\n\n"
+            f"EMAIL BODY: {email_body}\n\n"
+            f"RESUME CONTENT: {self._truncate(resume_snippet(sections, wanted_sections, resume_text))}"
+        )
+        return {
+            "model": self.model,
+            "messages": [
+                {
+                    "role": "system",
+                    "content": SYSTEM_PROMPT + instructions
+                },
+                {
+                    "role": "user",
+                    "content": combined_text
+                }
+            ],
+            "temperature": 0.1,
+            "max_tokens": max_tokens,
+            "response_format": {"type": "json_object"}
+        }
 
     def extract_info(self, email_subject, email_body, resume_text):
         """Extract structured data using an AI model with specific domain classification."""
-        try:
-            combined_text = (
-                f"EMAIL SUBJECT: {email_subject}\n\n"
-                f"EMAIL BODY: {email_body}\n\n"
-                f"RESUME CONTENT: {resume_text}"
-            )
-
-            company_roles = [
-                "LLM engineer", "AI/ML engineer", "SEO", "Full Stack Developer",
-                "Project manager", "content writer", "digital marketing",
-                "software developer", "UI/UX", "App developer", "graphic designer",
-                "videographer", "BDE(business developer executive)", "HR", "PPC"
-            ]
-
-            response = openai.chat.completions.create(
-                model=self.model,
-                messages=[
-                    {
-                        "role": "system",
-                        "content": (
-                            "You are a hyper-precise HR data extraction engine. From the provided text, extract a valid JSON object with the exact following keys:\n"
-                            "- 'Name': Full name of the applicant.\n"
-                            "- 'Phone': The 10-digit mobile number as a plain string of digits.\n"
-                            "- 'Education': A single-string summary of their education background.\n"
-                            "- 'JobHistory': Create a markdown-formatted bulleted list. Each bullet point, starting with a hyphen (-), should represent a single job, including the Job Title, Company, and a 1-sentence summary of responsibilities.\n"
-                            f"- 'Domain': Analyze the entire text and classify the candidate's primary role into ONE of the following: {', '.join(company_roles)}. Base your decision on their most recent and significant experience. If no role is a clear match, use 'Other'."
-                        )
-                    },
-                    {
-                        "role": "user",
-                        "content": combined_text
-                    }
-                ],
-                temperature=0.1,
-                max_tokens=1500,
-                response_format={"type": "json_object"}
-            )
+        if (cached := self.cache.get(self._cache_key(email_subject, email_body, resume_text))) is not None: return cached
+        sections = split_sections(resume_text)
+        known_fields = self.quick_extract(resume_text, sections)
+        bodies = [body for task in EXTRACTION_TASKS if (body := self._request_body(task, email_subject, email_body, resume_text, sections, known_fields))]
+        with ThreadPoolExecutor(max_workers=len(EXTRACTION_TASKS)) as executor:
+            parts = executor.map(self._run_request, bodies)
+        result = {**{key: value for part in parts for key, value in part.items()}, **known_fields}
+        self.remember(email_subject, email_body, resume_text, result)
+        return result
 
+    def _run_request(self, body):
+        try:
+            with self.request_slots: response = openai.chat.completions.create(**body)
             return self._parse_response(response.choices[0].message.content)
         except Exception as e:
             logger.error(f"AI processing failed: {str(e)}", exc_info=True)
             return {}
 
+    def submit_batch(self, items):
+        """Submits {custom_id: (subject, body, resume_text)} as one Batch API job (half the price of live calls). Returns the batch id."""
+        try:
+            lines = []
+            for custom_id, (email_subject, email_body, resume_text) in items.items():
+                sections = split_sections(resume_text)
+                known_fields = self.quick_extract(resume_text, sections)
+                for task in EXTRACTION_TASKS:
+                    body = self._request_body(task, email_subject, email_body, resume_text, sections, known_fields)
+                    if body: lines.append(json.dumps({"custom_id": f"{custom_id}:{task}", "method": "POST", "url": "/v1/chat/completions", "body": body}))
+            batch_file = openai.files.create(file=("extraction_batch.jsonl", "\n".join(lines).encode('utf-8')), purpose="batch")
+            batch = openai.batches.create(input_file_id=batch_file.id, endpoint="/v1/chat/completions", completion_window="24h")
+            logger.info(f"Submitted extraction batch {batch.id} with {len(items)} applications.")
+            return batch.id
+        except Exception as e:
+            logger.error(f"Batch submission failed: {str(e)}", exc_info=True)
+            return None
+
+    def fetch_batch_results(self, batch_id):
+        """Returns {custom_id: extracted data} once a batch has ended, or None while it is still running.
+        Applications whose requests all failed inside the batch are absent from the result."""
+        try:
+            batch = openai.batches.retrieve(batch_id)
+            if batch.status in ('validating', 'in_progress', 'finalizing'): return None
+            if batch.status != 'completed': logger.error(f"Extraction batch {batch_id} ended with status '{batch.status}'.")
+            results = {}
+            if batch.output_file_id:
+                for line in openai.files.content(batch.output_file_id).text.splitlines():
+                    record = json.loads(line)
+                    choices = ((record.get('response') or {}).get('body') or {}).get('choices')
+                    # Custom ids are "<application id>:<task>"; merge each application's task results
+                    if choices: results.setdefault(record['custom_id'].rsplit(':', 1)[0], {}).update(self._parse_response(choices[0]['message']['content']))
+            return results
+        except Exception as e:
+            logger.error(f"Could not fetch results for batch {batch_id}: {str(e)}", exc_info=True)
+            return None
+
     def _parse_response(self, json_str):
         """Parse AI response into a dictionary."""
+        if fenced := CODE_FENCE_RE.match(json_str or ''): json_str = fenced.group(1) # Models occasionally wrap JSON in a code fence
         try:
-            return json.loads(json_str)
-        except json.JSONDecodeError as e:
+            parsed = orjson.loads(json_str or '') if orjson else json.loads(json_str or '')
+        except ValueError as e: # Both json.JSONDecodeError and orjson.JSONDecodeError subclass ValueError
             logger.error(f"Failed to parse JSON response from AI: {str(e)}")
-            return {}
\ No newline at end of file
+            return {}
+        if not isinstance(parsed, dict):
+            logger.error(f"AI response was JSON {type(parsed).__name__}, not an object.")
+            return {}
+        return parsed
\ No newline at end of file
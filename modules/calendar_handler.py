@@ -1,31 +1,41 @@
 import datetime
-from zoneinfo import ZoneInfo
-from googleapiclient.discovery import build
-from utils.auth import get_google_credentials
+import numpy as np
+from functools import lru_cache
+from utils.auth import get_service
 from utils.logger import logger
+from config import LOCAL_TZ
 import uuid
 
+SLOT_STEP_SECONDS = 15 * 60
+WORKDAY_START_HOUR, WORKDAY_END_HOUR = 9, 18 # Slots may start from 9:00 up to (not including) 18:00 local time
+
+@lru_cache(maxsize=8)
+def _candidate_starts(window_start_ts, time_max_ts):
+    """Epoch seconds of every slot start within working hours on the weekdays of the window. Memoized, so
+    searches within the same quarter hour (e.g. another interviewer or duration) reuse the grid; the returned array is read-only."""
+    first_day = datetime.datetime.fromtimestamp(window_start_ts, LOCAL_TZ).date()
+    last_day = datetime.datetime.fromtimestamp(time_max_ts, LOCAL_TZ).date()
+    business_days = [day for day in (first_day + datetime.timedelta(days=i) for i in range((last_day - first_day).days + 1)) if day.weekday() < 5]
+    day_starts = np.array([int(datetime.datetime.combine(day, datetime.time(WORKDAY_START_HOUR), LOCAL_TZ).timestamp()) for day in business_days], dtype=np.int64)
+    offsets = np.arange(0, (WORKDAY_END_HOUR - WORKDAY_START_HOUR) * 3600, SLOT_STEP_SECONDS, dtype=np.int64)
+    candidates = (day_starts[:, None] + offsets).ravel()
+    candidates = candidates[(candidates >= window_start_ts) & (candidates < time_max_ts)]
+    candidates.flags.writeable = False
+    return candidates
+
 class CalendarHandler:
     def __init__(self):
         """Initializes the CalendarHandler with Google Calendar API service."""
         try:
-            self.service = build('calendar', 'v3', credentials=get_google_credentials())
+            self.service = get_service('calendar', 'v3')
             logger.info("Google Calendar service initialized successfully.")
         except Exception as e:
             logger.error(f"Failed to initialize Google Calendar service: {e}", exc_info=True)
             self.service = None
 
-    def find_available_slots(self, interviewer_email, duration_minutes, days_to_check=7):
-        """
-        Finds available time slots for an interviewer by fetching ALL events and treating them as busy.
-        """
-        if not self.service:
-            logger.error("Calendar service is not available.")
-            return []
-
-        local_tz = ZoneInfo("Asia/Kolkata")
-        now = datetime.datetime.now(local_tz)
-        potential_slot_start = now      
+    def _search_window(self, days_to_check):
+        """Returns (first candidate start, end of window): the next quarter hour within working hours, plus days_to_check days."""
+        potential_slot_start = datetime.datetime.now(LOCAL_TZ)
         if potential_slot_start.hour >= 18:
             potential_slot_start = (potential_slot_start + datetime.timedelta(days=1)).replace(hour=9, minute=0, second=0, microsecond=0)
   
@@ -35,14 +45,23 @@ class CalendarHandler:
             minutes_to_add = 15 - (potential_slot_start.minute % 15)
             potential_slot_start += datetime.timedelta(minutes=minutes_to_add)
         potential_slot_start = potential_slot_start.replace(second=0, microsecond=0)
+        return potential_slot_start, potential_slot_start + datetime.timedelta(days=days_to_check)
+
+    def find_available_slots(self, interviewer_email, duration_minutes, days_to_check=7):
+        """
+        Finds available time slots for an interviewer by fetching ALL events and treating them as busy.
+        """
+        if not self.service:
+            logger.error("Calendar service is not available.")
+            return []
 
-        time_max = potential_slot_start + datetime.timedelta(days=days_to_check)
-        logger.info(f"Searching for free slots for {interviewer_email} from {potential_slot_start} to {time_max}")
+        window_start, time_max = self._search_window(days_to_check)
+        logger.info(f"Searching for free slots for {interviewer_email} from {window_start} to {time_max}")
 
         try:
             events_result = self.service.events().list(
                 calendarId=interviewer_email,
-                timeMin=potential_slot_start.isoformat(),
+                timeMin=window_start.isoformat(),
                 timeMax=time_max.isoformat(),
                 singleEvents=True,
                 orderBy='startTime'
@@ -61,40 +80,33 @@ class CalendarHandler:
             if not start_str or not end_str: continue
 
             if 'T' not in start_str:
-                busy_start = datetime.datetime.fromisoformat(start_str).replace(tzinfo=local_tz)
-                busy_end = datetime.datetime.fromisoformat(end_str).replace(tzinfo=local_tz)
+                busy_start = datetime.datetime.fromisoformat(start_str).replace(tzinfo=LOCAL_TZ)
+                busy_end = datetime.datetime.fromisoformat(end_str).replace(tzinfo=LOCAL_TZ)
             else:
                 busy_start = datetime.datetime.fromisoformat(start_str); busy_end = datetime.datetime.fromisoformat(end_str)
-            busy_slots.append({'start': busy_start, 'end': busy_end})
+            busy_slots.append((busy_start, busy_end))
 
-        available_slots = []
-        while potential_slot_start < time_max:
-            # Skip weekends robustly
-            if potential_slot_start.weekday() >= 5: # 5 = Saturday, 6 = Sunday
-                days_to_add = 7 - potential_slot_start.weekday()
-                potential_slot_start = (potential_slot_start + datetime.timedelta(days=days_to_add)).replace(hour=9, minute=0)
-                continue
-            
-            # Reset to 9 AM on the next day if we go past 6 PM
-            if potential_slot_start.hour >= 18:
-                potential_slot_start = (potential_slot_start + datetime.timedelta(days=1)).replace(hour=9, minute=0)
-                continue
+        available_slots = self._free_slots(window_start, time_max, busy_slots, duration_minutes)
+        logger.info(f"Found {len(available_slots)} available slots for {interviewer_email}.")
+        return available_slots
 
-            potential_slot_end = potential_slot_start + datetime.timedelta(minutes=duration_minutes)
-            
-            is_free = True
-            for busy_period in busy_slots:
-                if potential_slot_start < busy_period['end'] and potential_slot_end > busy_period['start']:
-                    is_free = False
-                    break
-            
-            if is_free:
-                available_slots.append(potential_slot_start)
+    def _free_slots(self, window_start, time_max, busy_slots, duration_minutes):
+        """Returns the 15-minute slot starts in the window, within working hours, that don't overlap any busy (start, end) pair."""
+        # Sort and merge overlapping events so each candidate is checked against one interval
+        merged_busy = []
+        for busy_start, busy_end in sorted(busy_slots):
+            if merged_busy and busy_start <= merged_busy[-1][1]: merged_busy[-1][1] = max(merged_busy[-1][1], busy_end)
+            else: merged_busy.append([busy_start, busy_end])
+        busy_starts = np.array([int(b[0].timestamp()) for b in merged_busy], dtype=np.int64)
+        busy_ends = np.array([int(b[1].timestamp()) for b in merged_busy], dtype=np.int64)
 
-            potential_slot_start += datetime.timedelta(minutes=15)
+        candidates = _candidate_starts(int(window_start.timestamp()), int(time_max.timestamp()))
 
-        logger.info(f"Found {len(available_slots)} available slots for {interviewer_email}.")
-        return available_slots
+        # First busy interval ending after each candidate starts; the slot is free if that interval starts after it ends
+        next_busy = np.searchsorted(busy_ends, candidates, side='right')
+        next_busy_start = np.append(busy_starts, np.iinfo(np.int64).max)[next_busy]
+        free = next_busy_start >= candidates + duration_minutes * 60
+        return [datetime.datetime.fromtimestamp(int(ts), LOCAL_TZ) for ts in candidates[free]]
 
     def create_calendar_event(self, applicant_name, applicant_email, interviewer_email, start_time, end_time, description):
         if not self.service:
@@ -103,8 +115,8 @@ class CalendarHandler:
         event_summary = f"Interview: {applicant_name}"
         event_body = {
             'summary': event_summary, 'description': description,
-            'start': { 'dateTime': start_time.isoformat(), 'timeZone': 'Asia/Kolkata' },
-            'end': { 'dateTime': end_time.isoformat(), 'timeZone': 'Asia/Kolkata' },
+            'start': { 'dateTime': start_time.isoformat(), 'timeZone': LOCAL_TZ.key },
+            'end': { 'dateTime': end_time.isoformat(), 'timeZone': LOCAL_TZ.key },
             'attendees': [ {'email': interviewer_email}, {'email': applicant_email} ],
             'conferenceData': { 'createRequest': { 'requestId': f"{uuid.uuid4().hex}", 'conferenceSolutionKey': {'type': 'hangoutsMeet'} } },
             'reminders': { 'useDefault': True },
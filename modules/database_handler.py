@@ -1,7 +1,46 @@
+import io
+import time
 import psycopg2
+from psycopg2 import pool
+from psycopg2.extras import execute_values
+from contextlib import contextmanager
+from urllib.parse import quote
 import pandas as pd
+try: import connectorx as cx # Optional: decodes result sets in Rust straight into columnar arrays
+except ImportError: cx = None
 from utils.logger import logger
-from config import DB_NAME, DB_USER, DB_PASSWORD, DB_HOST, DB_PORT
+from config import DB_NAME, DB_USER, DB_PASSWORD, DB_HOST, DB_PORT, DB_POOL_MIN_CONN, DB_POOL_MAX_CONN, DB_POOL_RECYCLE
+
+INTERVIEWS_FOR_APPLICANT_SQL = """
+SELECT i.event_title, i.start_time, i.status, iv.name as interviewer_name
+FROM interviews i
+LEFT JOIN interviewers iv ON i.interviewer_id = iv.id
+WHERE i.applicant_id = %s
+ORDER BY i.start_time DESC;
+"""
+# Applicant columns are aliased to the PascalCase names the dashboard uses
+APPLICANT_FULL_COLUMNS = 'id AS "Id", name AS "Name", email AS "Email", phone AS "Phone", domain AS "Domain", job_history AS "JobHistory", education AS "Education", cv_url AS "CvUrl", status AS "Status", created_at AS "CreatedAt", gmail_thread_id AS "GmailThreadId"'
+APPLICANT_SUMMARY_COLUMNS = 'id AS "Id", name AS "Name", email AS "Email", domain AS "Domain", status AS "Status"'
+# Imports of at least BULK_COPY_THRESHOLD rows are streamed with COPY into a staging table, then deduplicated on insert
+BULK_COPY_THRESHOLD = 10_000
+# Sheet column -> applicants column; optional columns missing from a sheet are left out so the table defaults apply
+IMPORT_COLUMNS = {'Name': 'name', 'Email': 'email', 'Phone': 'phone', 'Domain': 'domain', 'Education': 'education', 'JobHistory': 'job_history', 'CvUrl': 'cv_url', 'Status': 'status'}
+# Plain columns, not LIKE applicants: copying the id default would draw ids from the applicants sequence
+STAGE_APPLICANTS_SQL = "CREATE TEMP TABLE applicants_stage (name TEXT, email TEXT, phone TEXT, domain TEXT, education TEXT, job_history TEXT, cv_url TEXT, status TEXT) ON COMMIT DROP;"
+COPY_APPLICANTS_STAGE_SQL = "COPY applicants_stage ({columns}) FROM STDIN WITH CSV"
+INSERT_STAGED_APPLICANTS_SQL = "INSERT INTO applicants ({columns}) SELECT {columns} FROM applicants_stage ON CONFLICT (email) DO NOTHING;"
+# Statements on the per-email ingestion path, prepared once per pooled connection so the server skips parsing and planning
+PREPARED_STATEMENTS = {
+    # Applicant and first email in one round-trip; no row comes back when the email address is already known
+    'insert_applicant': (
+        "WITH new_applicant AS (INSERT INTO applicants (name, email, phone, domain, education, job_history, cv_url, gmail_thread_id) "
+        "VALUES ($1, $2, $3, $4, $5, $6, $7, $8) ON CONFLICT (email) DO NOTHING RETURNING id), "
+        "first_email AS (INSERT INTO communications (applicant_id, gmail_message_id, sender, subject, body, direction) SELECT id, $9, $10, $11, $12, 'Incoming' FROM new_applicant) "
+        "SELECT id FROM new_applicant"
+    ),
+    'insert_communication': "INSERT INTO communications (applicant_id, gmail_message_id, sender, subject, body, direction) VALUES ($1, $2, $3, $4, $5, $6) ON CONFLICT (gmail_message_id) DO NOTHING",
+}
+CONVERSATIONS_FOR_APPLICANT_SQL = "SELECT gmail_message_id, sender, subject, body, direction, sent_at FROM communications WHERE applicant_id = %s ORDER BY sent_at ASC;"
 
 class DatabaseHandler:
     def __init__(self):
@@ -10,252 +49,407 @@ class DatabaseHandler:
             "user": DB_USER,
             "password": DB_PASSWORD,
             "host": DB_HOST,
-            "port": DB_PORT
+            "port": DB_PORT,
+            # TCP keepalives detect connections dropped while idle in the pool before a query is sent on them
+            "keepalives": 1, "keepalives_idle": 30, "keepalives_interval": 10, "keepalives_count": 3,
+            "connect_timeout": 5,
+            "application_name": "hr_system"
         }
-        self.conn = None
+        self.pool = None
+        self._conn_opened_at = {}
+        self._prepared = {} # connection -> names of the statements prepared on it
+        # For connectorx: every component percent-encoded (including '/' and '@'), an unset host meaning localhost,
+        # and the same connect timeout and application name as the pool
+        self._dsn = (f"postgresql://{quote(DB_USER or '', safe='')}:{quote(DB_PASSWORD or '', safe='')}@{quote(DB_HOST or 'localhost', safe='')}:{DB_PORT or 5432}/{quote(DB_NAME or '', safe='')}"
+                     f"?connect_timeout={self.conn_params['connect_timeout']}&application_name={self.conn_params['application_name']}")
     def _connect(self):
         try:
-            if self.conn is None or self.conn.closed: self.conn = psycopg2.connect(**self.conn_params)
+            if self.pool is None or self.pool.closed: self.pool = pool.ThreadedConnectionPool(DB_POOL_MIN_CONN, DB_POOL_MAX_CONN, **self.conn_params)
         except psycopg2.OperationalError as e:
-            logger.error(f"Could not connect to the database: {e}"); self.conn = None
-    def create_tables(self):
-        self._connect()
-        if not self.conn: return
-        queries = [
-            """CREATE TABLE IF NOT EXISTS applicants (id SERIAL PRIMARY KEY, name VARCHAR(255), email VARCHAR(255) UNIQUE, phone VARCHAR(20), domain VARCHAR(255), education TEXT, job_history TEXT, cv_url TEXT, status VARCHAR(255) DEFAULT 'New', created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP, gmail_thread_id VARCHAR(255));""",
-            """CREATE TABLE IF NOT EXISTS communications (id SERIAL PRIMARY KEY, applicant_id INTEGER REFERENCES applicants(id) ON DELETE CASCADE, gmail_message_id VARCHAR(255) UNIQUE, sender TEXT, subject TEXT, body TEXT, direction VARCHAR(50), sent_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP);""",
-            """CREATE TABLE IF NOT EXISTS export_logs (id SERIAL PRIMARY KEY, file_name VARCHAR(255), sheet_url TEXT, created_by VARCHAR(255), created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP);""",
-            """CREATE TABLE IF NOT EXISTS applicant_statuses (id SERIAL PRIMARY KEY, status_name VARCHAR(255) UNIQUE NOT NULL);""",
-            """CREATE TABLE IF NOT EXISTS interviewers (id SERIAL PRIMARY KEY, name VARCHAR(255) NOT NULL, email VARCHAR(255) UNIQUE NOT NULL);""",
-            """CREATE TABLE IF NOT EXISTS interviews (id SERIAL PRIMARY KEY, applicant_id INTEGER REFERENCES applicants(id) ON DELETE CASCADE, interviewer_id INTEGER REFERENCES interviewers(id) ON DELETE SET NULL, event_title VARCHAR(255), start_time TIMESTAMP WITH TIME ZONE, end_time TIMESTAMP WITH TIME ZONE, google_calendar_event_id VARCHAR(255), status VARCHAR(50) DEFAULT 'Pending');"""
-        ]
+            logger.error(f"Could not connect to the database: {e}"); self.pool = None
+        return self.pool
+
+    def _discard_conn(self, conn):
+        self._conn_opened_at.pop(conn, None); self._prepared.pop(conn, None); self.pool.putconn(conn, close=True)
+
+    def _execute_prepared(self, cur, name, params):
+        """Runs one of PREPARED_STATEMENTS, preparing it first if this connection hasn't yet (prepared statements outlive transactions)."""
+        prepared = self._prepared.setdefault(cur.connection, set())
+        if name not in prepared: cur.execute(f"PREPARE {name} AS {PREPARED_STATEMENTS[name]};"); prepared.add(name)
+        cur.execute(f"EXECUTE {name} ({', '.join(['%s'] * len(params))});", params)
+
+    @staticmethod
+    def _read_df(conn, query, params=None):
+        """Runs a query on a plain cursor and builds the DataFrame from the fetched rows in one call."""
+        with conn.cursor() as cur:
+            cur.execute(query, params)
+            return pd.DataFrame.from_records(cur.fetchall(), columns=[col[0] for col in cur.description], coerce_float=True)
+
+    @contextmanager
+    def _get_conn(self):
+        """Checks a connection out of the pool (yielding None if the database is unreachable) and returns it afterwards."""
+        if not self._connect(): yield None; return
         try:
-            with self.conn.cursor() as cur:
-                for query in queries: cur.execute(query)
-                self.conn.commit()
-                logger.info("All tables are ready.")
-        except Exception as e:
-            logger.error(f"Error during initial table creation: {e}"); self.conn.rollback(); return
+            conn = self.pool.getconn()
+            # Replace connections that were dropped while idle or have outlived DB_POOL_RECYCLE
+            while conn.closed or time.monotonic() - self._conn_opened_at.setdefault(conn, time.monotonic()) > DB_POOL_RECYCLE:
+                self._discard_conn(conn); conn = self.pool.getconn()
+        except (psycopg2.OperationalError, pool.PoolError) as e:
+            logger.error(f"Could not check out a database connection: {e}"); yield None; return
+        try: yield conn
+        finally:
+            if conn.closed: self._discard_conn(conn)
+            else:
+                self.pool.putconn(conn)
+                # putconn closes the connection itself when minconn connections are already idle; forget it then
+                if conn.closed: self._conn_opened_at.pop(conn, None); self._prepared.pop(conn, None)
+
+    def create_tables(self):
+        with self._get_conn() as conn:
+            if not conn: return
+            queries = [
+                """CREATE TABLE IF NOT EXISTS applicants (id SERIAL PRIMARY KEY, name VARCHAR(255), email VARCHAR(255) UNIQUE, phone VARCHAR(20), domain VARCHAR(255) DEFAULT 'Other', education TEXT, job_history TEXT, cv_url TEXT, status VARCHAR(255) DEFAULT 'New', created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP, gmail_thread_id VARCHAR(255));""",
+                # Tables created before the default existed; checked in the catalog first so later starts don't take the ALTER's exclusive lock
+                """DO $$ BEGIN IF EXISTS (SELECT 1 FROM information_schema.columns WHERE table_schema = current_schema() AND table_name = 'applicants' AND column_name = 'domain' AND column_default IS NULL) THEN ALTER TABLE applicants ALTER COLUMN domain SET DEFAULT 'Other'; END IF; END $$;""",
+                """CREATE TABLE IF NOT EXISTS communications (id SERIAL PRIMARY KEY, applicant_id INTEGER REFERENCES applicants(id) ON DELETE CASCADE, gmail_message_id VARCHAR(255) UNIQUE, sender TEXT, subject TEXT, body TEXT, direction VARCHAR(50), sent_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP);""",
+                """CREATE TABLE IF NOT EXISTS export_logs (id SERIAL PRIMARY KEY, file_name VARCHAR(255), sheet_url TEXT, created_by VARCHAR(255), created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP);""",
+                """CREATE TABLE IF NOT EXISTS applicant_statuses (id SERIAL PRIMARY KEY, status_name VARCHAR(255) UNIQUE NOT NULL);""",
+                """CREATE TABLE IF NOT EXISTS interviewers (id SERIAL PRIMARY KEY, name VARCHAR(255) NOT NULL, email VARCHAR(255) UNIQUE NOT NULL);""",
+                """CREATE TABLE IF NOT EXISTS processed_messages (gmail_message_id VARCHAR(255) PRIMARY KEY, processed_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP);""",
+                """CREATE TABLE IF NOT EXISTS pending_batches (gmail_message_id VARCHAR(255) PRIMARY KEY, batch_id VARCHAR(255) NOT NULL, submitted_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP);""",
+                """CREATE TABLE IF NOT EXISTS interviews (id SERIAL PRIMARY KEY, applicant_id INTEGER REFERENCES applicants(id) ON DELETE CASCADE, interviewer_id INTEGER REFERENCES interviewers(id) ON DELETE SET NULL, event_title VARCHAR(255), start_time TIMESTAMP WITH TIME ZONE, end_time TIMESTAMP WITH TIME ZONE, google_calendar_event_id VARCHAR(255), status VARCHAR(50) DEFAULT 'Pending');""",
+                # Serves the newest-first ordering of the applicant reads
+                """CREATE INDEX IF NOT EXISTS idx_applicants_created_at ON applicants (created_at DESC);""",
+                # Per-applicant detail reads, already in display order
+                """CREATE INDEX IF NOT EXISTS idx_communications_applicant ON communications (applicant_id, sent_at);""",
+                """CREATE INDEX IF NOT EXISTS idx_interviews_applicant ON interviews (applicant_id, start_time DESC);""",
+                # Lets interviewer deletes (ON DELETE SET NULL) find referencing interviews without a scan
+                """CREATE INDEX IF NOT EXISTS idx_interviews_interviewer ON interviews (interviewer_id);""",
+                """DROP INDEX IF EXISTS idx_applicants_thread;""", # Created by earlier versions; nothing filters on gmail_thread_id alone
+                # Partial index covering get_active_threads: only applicants still in the pipeline, readable index-only
+                """CREATE INDEX IF NOT EXISTS idx_applicants_active_threads ON applicants (id, gmail_thread_id) WHERE status NOT IN ('Rejected', 'Hired');""",
+                """CREATE INDEX IF NOT EXISTS idx_processed_messages_at ON processed_messages (processed_at DESC);"""
+            ]
+            try:
+                with conn.cursor() as cur:
+                    cur.execute("\n".join(queries)) # Each statement ends with ';', so the whole schema goes over in one round-trip
+                    conn.commit()
+                    logger.info("All tables are ready.")
+            except Exception as e:
+                logger.error(f"Error during initial table creation: {e}"); conn.rollback(); return
         self._populate_initial_statuses()
 
     def log_interview(self, applicant_id, interviewer_id, title, start_time, end_time, event_id):
-        self._connect()
-        if not self.conn: return False
-        sql = """
-        INSERT INTO interviews (applicant_id, interviewer_id, event_title, start_time, end_time, google_calendar_event_id, status)
-        VALUES (%s, %s, %s, %s, %s, %s, 'Scheduled');
-        """
-        try:
-            with self.conn.cursor() as cur:
-                cur.execute(sql, (int(applicant_id), int(interviewer_id), title, start_time, end_time, event_id))
-                self.conn.commit()
-                logger.info(f"Successfully logged interview for applicant {applicant_id}")
-                return True
-        except Exception as e:
-            logger.error(f"Failed to log interview: {e}", exc_info=True)
-            self.conn.rollback()
-            return False
-
-    def get_interviews_for_applicant(self, applicant_id):
-        self._connect()
-        if not self.conn: return pd.DataFrame()
-        query = """
-        SELECT i.event_title, i.start_time, i.status, iv.name as interviewer_name
-        FROM interviews i
-        LEFT JOIN interviewers iv ON i.interviewer_id = iv.id
-        WHERE i.applicant_id = %s
-        ORDER BY i.start_time DESC;
-        """
-        try:
-            df = pd.read_sql_query(query, self.conn, params=(int(applicant_id),))
-            return df
-        except Exception as e:
-            logger.error(f"Error fetching interviews for applicant {applicant_id}: {e}")
-            return pd.DataFrame()
+        with self._get_conn() as conn:
+            if not conn: return False
+            sql = """
+            INSERT INTO interviews (applicant_id, interviewer_id, event_title, start_time, end_time, google_calendar_event_id, status)
+            VALUES (%s, %s, %s, %s, %s, %s, 'Scheduled');
+            """
+            try:
+                with conn.cursor() as cur:
+                    cur.execute(sql, (int(applicant_id), int(interviewer_id), title, start_time, end_time, event_id))
+                    conn.commit()
+                    logger.info("Successfully logged interview for applicant %s", applicant_id)
+                    return True
+            except Exception as e:
+                logger.error(f"Failed to log interview: {e}", exc_info=True)
+                conn.rollback()
+                return False
 
     def get_interviewers(self):
-        self._connect();
-        if not self.conn: return pd.DataFrame()
-        query = "SELECT id, name, email FROM interviewers ORDER BY name;"
-        try: return pd.read_sql_query(query, self.conn)
-        except Exception as e: logger.error(f"Error fetching interviewers: {e}"); return pd.DataFrame()
+        with self._get_conn() as conn:
+            if not conn: return pd.DataFrame()
+            query = "SELECT id, name, email FROM interviewers ORDER BY name;"
+            try: return self._read_df(conn, query)
+            except Exception as e: logger.error(f"Error fetching interviewers: {e}"); return pd.DataFrame()
 
     def add_interviewer(self, name, email):
-        self._connect();
-        if not self.conn: return False
-        sql = "INSERT INTO interviewers (name, email) VALUES (%s, %s) ON CONFLICT (email) DO NOTHING;"
-        try:
-            with self.conn.cursor() as cur: cur.execute(sql, (name, email)); self.conn.commit(); return cur.rowcount > 0
-        except Exception as e: logger.error(f"Error adding interviewer '{name}': {e}"); self.conn.rollback(); return False
+        with self._get_conn() as conn:
+            if not conn: return False
+            sql = "INSERT INTO interviewers (name, email) VALUES (%s, %s) ON CONFLICT (email) DO NOTHING;"
+            try:
+                with conn.cursor() as cur: cur.execute(sql, (name, email)); conn.commit(); return cur.rowcount > 0
+            except Exception as e: logger.error(f"Error adding interviewer '{name}': {e}"); conn.rollback(); return False
 
     def delete_interviewer(self, interviewer_id):
-        self._connect();
-        if not self.conn: return False
-        sql = "DELETE FROM interviewers WHERE id = %s;"
-        try:
-            with self.conn.cursor() as cur:
-                cur.execute(sql, (int(interviewer_id),)); self.conn.commit(); return True
-        except Exception as e: logger.error(f"Error deleting interviewer {interviewer_id}: {e}"); self.conn.rollback(); return False
+        with self._get_conn() as conn:
+            if not conn: return False
+            sql = "DELETE FROM interviewers WHERE id = %s;"
+            try:
+                with conn.cursor() as cur:
+                    cur.execute(sql, (int(interviewer_id),)); conn.commit(); return True
+            except Exception as e: logger.error(f"Error deleting interviewer {interviewer_id}: {e}"); conn.rollback(); return False
 
     def _populate_initial_statuses(self):
-        self._connect();
-        if not self.conn: return
-        try:
-            with self.conn.cursor() as cur:
-                cur.execute("SELECT COUNT(*) FROM applicant_statuses;")
-                if cur.fetchone()[0] == 0:
-                    default_statuses = ["New", "Screening", "Interview Round 1", "Task Sent", "Interview Round 2", "Offer", "Rejected", "Hired"]
-                    insert_query = "INSERT INTO applicant_statuses (status_name) VALUES (%s);"
-                    for status in default_statuses: cur.execute(insert_query, (status,))
-                    self.conn.commit(); logger.info("Populated applicant_statuses with default values.")
-        except Exception as e: logger.error(f"Error populating default statuses: {e}"); self.conn.rollback()
+        with self._get_conn() as conn:
+            if not conn: return
+            try:
+                with conn.cursor() as cur:
+                    cur.execute("SELECT COUNT(*) FROM applicant_statuses;")
+                    if cur.fetchone()[0] == 0:
+                        default_statuses = ["New", "Screening", "Interview Round 1", "Task Sent", "Interview Round 2", "Offer", "Rejected", "Hired"]
+                        # One multi-row insert; ON CONFLICT covers the dashboard and the worker seeding at the same time
+                        execute_values(cur, "INSERT INTO applicant_statuses (status_name) VALUES %s ON CONFLICT (status_name) DO NOTHING;", [(status,) for status in default_statuses])
+                        conn.commit(); logger.info("Populated applicant_statuses with default values.")
+            except Exception as e: logger.error(f"Error populating default statuses: {e}"); conn.rollback()
 
     def get_statuses(self):
-        self._connect();
-        if not self.conn: return []
-        try:
-            with self.conn.cursor() as cur: cur.execute("SELECT status_name FROM applicant_statuses ORDER BY id;"); return [row[0] for row in cur.fetchall()]
-        except Exception as e: logger.error(f"Error fetching statuses: {e}"); return []
+        with self._get_conn() as conn:
+            if not conn: return []
+            try:
+                with conn.cursor() as cur: cur.execute("SELECT status_name FROM applicant_statuses ORDER BY id;"); return [row[0] for row in cur.fetchall()]
+            except Exception as e: logger.error(f"Error fetching statuses: {e}"); return []
 
     def add_status(self, status_name):
-        self._connect();
-        if not self.conn: return False
-        sql = "INSERT INTO applicant_statuses (status_name) VALUES (%s) ON CONFLICT (status_name) DO NOTHING;"
-        try:
-            with self.conn.cursor() as cur: cur.execute(sql, (status_name,)); self.conn.commit(); return cur.rowcount > 0
-        except Exception as e: logger.error(f"Error adding status '{status_name}': {e}"); self.conn.rollback(); return False
+        with self._get_conn() as conn:
+            if not conn: return False
+            sql = "INSERT INTO applicant_statuses (status_name) VALUES (%s) ON CONFLICT (status_name) DO NOTHING;"
+            try:
+                with conn.cursor() as cur: cur.execute(sql, (status_name,)); conn.commit(); return cur.rowcount > 0
+            except Exception as e: logger.error(f"Error adding status '{status_name}': {e}"); conn.rollback(); return False
 
     def delete_status(self, status_name):
-        self._connect();
-        if not self.conn: return "Database connection failed."
-        check_sql = "SELECT 1 FROM applicants WHERE status = %s LIMIT 1;"; delete_sql = "DELETE FROM applicant_statuses WHERE status_name = %s;"
-        try:
-            with self.conn.cursor() as cur:
-                cur.execute(check_sql, (status_name,))
-                if cur.fetchone(): return f"Cannot delete '{status_name}' as it is currently assigned to one or more applicants."
-                cur.execute(delete_sql, (status_name,)); self.conn.commit()
-                if cur.rowcount > 0: return None
-                else: return f"Status '{status_name}' not found."
-        except Exception as e: logger.error(f"Error deleting status '{status_name}': {e}"); self.conn.rollback(); return f"An unexpected error occurred: {e}"
+        with self._get_conn() as conn:
+            if not conn: return "Database connection failed."
+            delete_sql = "DELETE FROM applicant_statuses WHERE status_name = %(name)s AND NOT EXISTS (SELECT 1 FROM applicants WHERE status = %(name)s);"
+            check_sql = "SELECT 1 FROM applicants WHERE status = %s LIMIT 1;"
+            try:
+                with conn.cursor() as cur:
+                    cur.execute(delete_sql, {'name': status_name}); conn.commit()
+                    if cur.rowcount > 0: return None
+                    # Nothing deleted: only now find out whether the status is in use or doesn't exist
+                    cur.execute(check_sql, (status_name,))
+                    if cur.fetchone(): return f"Cannot delete '{status_name}' as it is currently assigned to one or more applicants."
+                    else: return f"Status '{status_name}' not found."
+            except Exception as e: logger.error(f"Error deleting status '{status_name}': {e}"); conn.rollback(); return f"An unexpected error occurred: {e}"
 
     def delete_applicants(self, applicant_ids):
         if not applicant_ids: return False
-        self._connect()
-        if not self.conn: return False
-        ids_tuple = tuple(int(id) for id in applicant_ids)
-        sql = "DELETE FROM applicants WHERE id IN %s;"
-        try:
-            with self.conn.cursor() as cur:
-                cur.execute(sql, (ids_tuple,))
-                self.conn.commit()
-                logger.info(f"Successfully deleted {cur.rowcount} applicants.")
-                return True
-        except Exception as e:
-            logger.error(f"Error deleting applicants: {e}")
-            self.conn.rollback()
-            return False
+        with self._get_conn() as conn:
+            if not conn: return False
+            ids_list = [int(id) for id in applicant_ids]
+            # One array parameter keeps the statement text the same however many ids are deleted
+            sql = "DELETE FROM applicants WHERE id = ANY(%s::int[]);"
+            try:
+                with conn.cursor() as cur:
+                    cur.execute(sql, (ids_list,))
+                    conn.commit()
+                    logger.info("Successfully deleted %s applicants.", cur.rowcount)
+                    return True
+            except Exception as e:
+                logger.error(f"Error deleting applicants: {e}")
+                conn.rollback()
+                return False
 
     def insert_applicant_and_communication(self, applicant_data, email_data):
-        self._connect();
-        if not self.conn: return None
-        check_sql = "SELECT id FROM applicants WHERE email = %s;"; insert_applicant_sql = "INSERT INTO applicants (name, email, phone, domain, education, job_history, cv_url, gmail_thread_id, status) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s) RETURNING id;"; insert_comm_sql = "INSERT INTO communications (applicant_id, gmail_message_id, sender, subject, body, direction) VALUES (%s, %s, %s, %s, %s, 'Incoming');"
-        try:
-            with self.conn.cursor() as cur:
-                cur.execute(check_sql, (applicant_data.get("Email"),))
-                if cur.fetchone(): logger.info(f"Skipping duplicate applicant: {applicant_data.get('Email')}"); return None                
-                cur.execute(insert_applicant_sql, (applicant_data.get("Name"), applicant_data.get("Email"), applicant_data.get("Phone"), applicant_data.get("Domain", "Other"), applicant_data.get("Education"), applicant_data.get("JobHistory"), applicant_data.get("CV_URL"), email_data.get("thread_id"), "New")); applicant_id = cur.fetchone()[0]
-                cur.execute(insert_comm_sql, (applicant_id, email_data.get("id"), email_data.get("sender"), email_data.get("subject"), email_data.get("body"))); self.conn.commit(); logger.info(f"New applicant '{applicant_data.get('Name')}' and initial email inserted."); return applicant_id
-        except Exception as e: logger.error(f"Error in combined insert: {e}", exc_info=True); self.conn.rollback(); return None
+        with self._get_conn() as conn:
+            if not conn: return None
+            try:
+                with conn.cursor() as cur:
+                    self._execute_prepared(cur, 'insert_applicant', (applicant_data.get("Name"), applicant_data.get("Email"), applicant_data.get("Phone"), applicant_data.get("Domain", "Other"), applicant_data.get("Education"), applicant_data.get("JobHistory"), applicant_data.get("CV_URL"), email_data.get("thread_id"), email_data.get("id"), email_data.get("sender"), email_data.get("subject"), email_data.get("body")))
+                    row = cur.fetchone(); conn.commit()
+                    if not row: logger.info("Skipping duplicate applicant: %s", applicant_data.get('Email')); return None
+                    logger.info("New applicant '%s' and initial email inserted.", applicant_data.get('Name')); return row[0]
+            except Exception as e: logger.error(f"Error in combined insert: {e}", exc_info=True); conn.rollback(); return None
 
     def update_applicant_status(self, applicant_id, new_status):
-        self._connect();
-        if not self.conn: return False
-        sql = "UPDATE applicants SET status = %s WHERE id = %s;"
-        try:
-            with self.conn.cursor() as cur:
-                cur.execute(sql, (new_status, int(applicant_id))); self.conn.commit(); logger.info(f"Updated status for applicant {applicant_id} to '{new_status}'."); return True
-        except Exception as e: logger.error(f"Error updating status: {e}"); self.conn.rollback(); return False
+        with self._get_conn() as conn:
+            if not conn: return False
+            sql = "UPDATE applicants SET status = %s WHERE id = %s;"
+            try:
+                with conn.cursor() as cur:
+                    cur.execute(sql, (new_status, int(applicant_id))); conn.commit(); logger.info("Updated status for applicant %s to '%s'.", applicant_id, new_status); return True
+            except Exception as e: logger.error(f"Error updating status: {e}"); conn.rollback(); return False
 
     def insert_communication(self, comm_data):
-        self._connect();
-        if not self.conn: return False
-        sql = "INSERT INTO communications (applicant_id, gmail_message_id, sender, subject, body, direction) VALUES (%s, %s, %s, %s, %s, %s) ON CONFLICT (gmail_message_id) DO NOTHING;"
-        try:
-            with self.conn.cursor() as cur:
-                cur.execute(sql, (int(comm_data.get("applicant_id")), comm_data.get("gmail_message_id"), comm_data.get("sender"), comm_data.get("subject"), comm_data.get("body"), comm_data.get("direction"))); self.conn.commit(); return True
-        except Exception as e: logger.error(f"Error inserting communication: {e}"); self.conn.rollback(); return False
-
-    def get_conversations(self, applicant_id):
-        self._connect();
-        if not self.conn: return pd.DataFrame()
-        query = "SELECT gmail_message_id, sender, subject, body, direction, sent_at FROM communications WHERE applicant_id = %s ORDER BY sent_at ASC;"
-        try:
-            return pd.read_sql_query(query, self.conn, params=(int(applicant_id),))
-        except Exception as e: logger.error(f"Error fetching conversations: {e}"); return pd.DataFrame()
+        with self._get_conn() as conn:
+            if not conn: return False
+            try:
+                with conn.cursor() as cur:
+                    self._execute_prepared(cur, 'insert_communication', (int(comm_data.get("applicant_id")), comm_data.get("gmail_message_id"), comm_data.get("sender"), comm_data.get("subject"), comm_data.get("body"), comm_data.get("direction"))); conn.commit(); return True
+            except Exception as e: logger.error(f"Error inserting communication: {e}"); conn.rollback(); return False
+
+    def get_applicant_bundle(self, applicant_id):
+        """Fetches an applicant's interviews and conversations in one transaction on a single connection."""
+        bundle = {'interviews': pd.DataFrame(), 'conversations': pd.DataFrame()}
+        with self._get_conn() as conn:
+            if not conn: return bundle
+            try:
+                bundle['interviews'] = self._read_df(conn, INTERVIEWS_FOR_APPLICANT_SQL, (int(applicant_id),))
+                bundle['conversations'] = self._read_df(conn, CONVERSATIONS_FOR_APPLICANT_SQL, (int(applicant_id),))
+            except Exception as e: logger.error(f"Error fetching interviews and conversations for applicant {applicant_id}: {e}")
+            return bundle
+
+    def fetch_applicants_as_df(self, applicant_ids=None):
+        """Fetches full applicant rows, optionally limited to the given ids (any iterable, e.g. a set)."""
+        with self._get_conn() as conn:
+            if not conn: return pd.DataFrame()
+            query = f"SELECT {APPLICANT_FULL_COLUMNS} FROM applicants"; params = None
+            if applicant_ids is not None: query += " WHERE id = ANY(%s)"; params = ([int(id) for id in applicant_ids],)
+            try: df = self._read_df(conn, query + " ORDER BY created_at DESC;", params); df['JobHistory'] = df['JobHistory'].fillna(''); return df
+            except Exception as e: logger.error(f"Error fetching applicants: {e}"); return pd.DataFrame()
+
+    def fetch_applicants_summary_as_df(self):
+        """Fetches only the columns needed to list and filter applicants, via connectorx when it is installed."""
+        query = f"SELECT {APPLICANT_SUMMARY_COLUMNS} FROM applicants ORDER BY created_at DESC"
+        if cx:
+            try: return cx.read_sql(self._dsn, query)
+            except Exception as e: logger.warning("connectorx read failed, falling back to psycopg2: %s", e)
+        with self._get_conn() as conn:
+            if not conn: return pd.DataFrame()
+            try: return self._read_df(conn, query)
+            except Exception as e: logger.error(f"Error fetching applicant summaries: {e}"); return pd.DataFrame()
 
-    def fetch_applicants_as_df(self):
-        self._connect();
-        if not self.conn: return pd.DataFrame()
-        query = "SELECT id, name, email, phone, domain, job_history, education, cv_url, status, created_at, gmail_thread_id FROM applicants ORDER BY created_at DESC;"
-        try: df = pd.read_sql_query(query, self.conn); df['job_history'] = df['job_history'].fillna(''); return df
-        except Exception as e: logger.error(f"Error fetching applicants: {e}"); return pd.DataFrame()
+    def fetch_applicant(self, applicant_id):
+        """Fetches one applicant as a dict of column name to value, or None if not found."""
+        with self._get_conn() as conn:
+            if not conn: return None
+            query = f"SELECT {APPLICANT_FULL_COLUMNS} FROM applicants WHERE id = %s;"
+            try:
+                with conn.cursor() as cur:
+                    cur.execute(query, (int(applicant_id),)); row = cur.fetchone()
+                    return dict(zip([col[0] for col in cur.description], row)) if row else None
+            except Exception as e: logger.error(f"Error fetching applicant {applicant_id}: {e}"); return None
 
     def get_active_threads(self):
-        self._connect();
-        if not self.conn: return []
-        query = "SELECT id, gmail_thread_id FROM applicants WHERE status NOT IN ('Rejected', 'Hired');"
-        try:
-            with self.conn.cursor() as cur: cur.execute(query); return cur.fetchall() 
-        except Exception as e: logger.error(f"Error fetching active threads: {e}"); return []
+        with self._get_conn() as conn:
+            if not conn: return []
+            query = "SELECT id, gmail_thread_id FROM applicants WHERE status NOT IN ('Rejected', 'Hired');"
+            try:
+                with conn.cursor() as cur: cur.execute(query); return cur.fetchall()
+            except Exception as e: logger.error(f"Error fetching active threads: {e}"); return []
+
+    def get_known_message_ids(self, applicant_ids):
+        """Returns {applicant_id: set of stored gmail_message_ids} for all the given applicants in one query."""
+        known = {}
+        with self._get_conn() as conn:
+            if not conn: return known
+            query = "SELECT applicant_id, gmail_message_id FROM communications WHERE applicant_id = ANY(%s);"
+            try:
+                with conn.cursor() as cur:
+                    cur.execute(query, ([int(id) for id in applicant_ids],))
+                    for applicant_id, gmail_message_id in cur: known.setdefault(applicant_id, set()).add(gmail_message_id)
+            except Exception as e: logger.error(f"Error fetching known message ids: {e}")
+            return known
+
+    def get_recent_processed_message_ids(self, limit):
+        """Returns up to `limit` handled Gmail message ids, oldest first."""
+        with self._get_conn() as conn:
+            if not conn: return []
+            query = "SELECT gmail_message_id FROM processed_messages ORDER BY processed_at DESC LIMIT %s;"
+            try:
+                with conn.cursor() as cur: cur.execute(query, (limit,)); return [row[0] for row in reversed(cur.fetchall())]
+            except Exception as e: logger.error(f"Error fetching processed message ids: {e}"); return []
+
+    def mark_message_processed(self, gmail_message_id):
+        with self._get_conn() as conn:
+            if not conn: return False
+            sql = "INSERT INTO processed_messages (gmail_message_id) VALUES (%s) ON CONFLICT (gmail_message_id) DO UPDATE SET processed_at = CURRENT_TIMESTAMP;"
+            try:
+                with conn.cursor() as cur: cur.execute(sql, (gmail_message_id,)); conn.commit(); return True
+            except Exception as e: logger.error(f"Error recording processed message {gmail_message_id}: {e}"); conn.rollback(); return False
+
+    def add_pending_batch(self, batch_id, gmail_message_ids):
+        """Records which applications an extraction batch covers, so a restart collects its results instead of resubmitting them."""
+        with self._get_conn() as conn:
+            if not conn: return False
+            sql = "INSERT INTO pending_batches (gmail_message_id, batch_id) VALUES %s ON CONFLICT (gmail_message_id) DO UPDATE SET batch_id = EXCLUDED.batch_id, submitted_at = CURRENT_TIMESTAMP;"
+            try:
+                with conn.cursor() as cur: execute_values(cur, sql, [(msg_id, batch_id) for msg_id in gmail_message_ids]); conn.commit(); return True
+            except Exception as e: logger.error(f"Error recording extraction batch {batch_id}: {e}"); conn.rollback(); return False
+
+    def get_pending_batches(self):
+        """Returns {batch_id: [gmail_message_id, ...]} for every extraction batch not yet collected."""
+        with self._get_conn() as conn:
+            if not conn: return {}
+            try:
+                with conn.cursor() as cur:
+                    cur.execute("SELECT batch_id, gmail_message_id FROM pending_batches ORDER BY submitted_at;")
+                    batches = {}
+                    for batch_id, msg_id in cur.fetchall(): batches.setdefault(batch_id, []).append(msg_id)
+                    return batches
+            except Exception as e: logger.error(f"Error fetching pending extraction batches: {e}"); return {}
+
+    def remove_pending_batch(self, batch_id):
+        with self._get_conn() as conn:
+            if not conn: return False
+            try:
+                with conn.cursor() as cur: cur.execute("DELETE FROM pending_batches WHERE batch_id = %s;", (batch_id,)); conn.commit(); return True
+            except Exception as e: logger.error(f"Error removing extraction batch {batch_id}: {e}"); conn.rollback(); return False
+
+    def insert_replies(self, comms):
+        """Stores a pass's incoming replies and records their message ids as processed: two multi-row inserts, one transaction."""
+        with self._get_conn() as conn:
+            if not conn: return False
+            comm_sql = "INSERT INTO communications (applicant_id, gmail_message_id, sender, subject, body, direction) VALUES %s ON CONFLICT (gmail_message_id) DO NOTHING;"
+            processed_sql = "INSERT INTO processed_messages (gmail_message_id) VALUES %s ON CONFLICT (gmail_message_id) DO UPDATE SET processed_at = CURRENT_TIMESTAMP;"
+            try:
+                with conn.cursor() as cur:
+                    execute_values(cur, comm_sql, [(int(comm["applicant_id"]), comm["gmail_message_id"], comm["sender"], comm["subject"], comm["body"], comm["direction"]) for comm in comms])
+                    execute_values(cur, processed_sql, [(comm["gmail_message_id"],) for comm in comms])
+                    conn.commit(); return True
+            except Exception as e: logger.error(f"Error inserting {len(comms)} replies: {e}"); conn.rollback(); return False
 
     def insert_export_log(self, file_name, sheet_url, user="HR"):
-        self._connect();
-        if not self.conn: return False
-        sql = "INSERT INTO export_logs (file_name, sheet_url, created_by) VALUES (%s, %s, %s);"
-        try:
-            with self.conn.cursor() as cur: cur.execute(sql, (file_name, sheet_url, user)); self.conn.commit(); logger.info(f"New export log created for: {file_name}"); return True
-        except Exception as e: logger.error(f"Error inserting export log: {e}"); self.conn.rollback(); return False
+        with self._get_conn() as conn:
+            if not conn: return False
+            sql = "INSERT INTO export_logs (file_name, sheet_url, created_by) VALUES (%s, %s, %s);"
+            try:
+                with conn.cursor() as cur: cur.execute(sql, (file_name, sheet_url, user)); conn.commit(); logger.info("New export log created for: %s", file_name); return True
+            except Exception as e: logger.error(f"Error inserting export log: {e}"); conn.rollback(); return False
 
     def delete_export_log(self, log_id):
-        self._connect();
-        if not self.conn: return False
-        sql = "DELETE FROM export_logs WHERE id = %s;"
-        try:
-            with self.conn.cursor() as cur:
-                cur.execute(sql, (int(log_id),)); self.conn.commit(); logger.info(f"Deleted export log with ID: {log_id}"); return True
-        except Exception as e: logger.error(f"Error deleting export log {log_id}: {e}"); self.conn.rollback(); return False
+        with self._get_conn() as conn:
+            if not conn: return False
+            sql = "DELETE FROM export_logs WHERE id = %s;"
+            try:
+                with conn.cursor() as cur:
+                    cur.execute(sql, (int(log_id),)); conn.commit(); logger.info("Deleted export log with ID: %s", log_id); return True
+            except Exception as e: logger.error(f"Error deleting export log {log_id}: {e}"); conn.rollback(); return False
 
     def fetch_export_logs(self):
-        self._connect();
-        if not self.conn: return pd.DataFrame()
-        query = "SELECT id, file_name, sheet_url, created_at FROM export_logs ORDER BY created_at DESC LIMIT 5;"
-        try: return pd.read_sql_query(query, self.conn)
-        except Exception as e: logger.error(f"Error fetching export logs: {e}"); return pd.DataFrame()
-    
+        with self._get_conn() as conn:
+            if not conn: return pd.DataFrame()
+            query = "SELECT id, file_name, sheet_url, created_at FROM export_logs ORDER BY created_at DESC LIMIT 5;"
+            try: return self._read_df(conn, query)
+            except Exception as e: logger.error(f"Error fetching export logs: {e}"); return pd.DataFrame()
+
     def insert_bulk_applicants(self, applicants_df):
-        self._connect();
-        if not self.conn: return 0, 0
-        inserted_count, skipped_count = 0, 0
-        applicants_df.columns = [col.replace('_', ' ').title().replace(' ', '') for col in applicants_df.columns]
-        required_cols = ['Name', 'Email']
-        if not all(col in applicants_df.columns for col in required_cols):
-            logger.error(f"Import failed: DataFrame is missing required columns 'Name' or 'Email'. Found: {list(applicants_df.columns)}"); return "Import failed: The sheet must contain 'Name' and 'Email' columns.", 0
-        check_sql = "SELECT id FROM applicants WHERE email = %s;"; insert_sql = "INSERT INTO applicants (name, email, phone, domain, education, job_history, cv_url, status) VALUES (%s, %s, %s, %s, %s, %s, %s, %s);"
-        try:
-            with self.conn.cursor() as cur:
-                for _, row in applicants_df.iterrows():
-                    email = row.get('Email')
-                    if not email: skipped_count += 1; continue
-                    cur.execute(check_sql, (email,))
-                    if cur.fetchone(): skipped_count += 1; continue
-                    cur.execute(insert_sql, (row.get('Name'), email, row.get('Phone'), row.get('Domain', 'Other'), row.get('Education'), row.get('JobHistory'), row.get('CvUrl'), row.get('Status', 'New'))); inserted_count += 1
-                self.conn.commit(); logger.info(f"Bulk insert complete. Inserted: {inserted_count}, Skipped: {skipped_count}")
-        except Exception as e: logger.error(f"Error during bulk insert: {e}", exc_info=True); self.conn.rollback(); return str(e), 0
-        return inserted_count, skipped_count
+        with self._get_conn() as conn:
+            if not conn: return 0, 0
+            inserted_count, skipped_count = 0, 0
+            # Renamed into a new frame so the caller's DataFrame is left untouched
+            applicants_df = applicants_df.rename(columns=lambda col: col.replace('_', ' ').title().replace(' ', ''))
+            required_cols = ['Name', 'Email']
+            if not all(col in applicants_df.columns for col in required_cols):
+                logger.error(f"Import failed: DataFrame is missing required columns 'Name' or 'Email'. Found: {list(applicants_df.columns)}"); return "Import failed: The sheet must contain 'Name' and 'Email' columns.", 0
+            applicants_df = applicants_df.astype(object).where(pd.notna(applicants_df), None)
+            has_email = applicants_df['Email'].astype(bool)
+            import_df = applicants_df.loc[has_email, [col for col in IMPORT_COLUMNS if col in applicants_df.columns]]
+            columns = ", ".join(IMPORT_COLUMNS[col] for col in import_df.columns)
+            skipped_count = len(applicants_df) - len(import_df)
+            # The unique constraint on email does the duplicate check server-side, in one statement per page of rows
+            insert_sql = f"INSERT INTO applicants ({columns}) VALUES %s ON CONFLICT (email) DO NOTHING RETURNING id;"
+            try:
+                with conn.cursor() as cur:
+                    if len(import_df) >= BULK_COPY_THRESHOLD: inserted_count = self._copy_applicants(cur, import_df, columns)
+                    elif len(import_df): inserted_count = len(execute_values(cur, insert_sql, list(import_df.itertuples(index=False, name=None)), page_size=1000, fetch=True))
+                    skipped_count += len(import_df) - inserted_count
+                    conn.commit(); logger.info("Bulk insert complete. Inserted: %s, Skipped: %s", inserted_count, skipped_count)
+            except Exception as e: logger.error(f"Error during bulk insert: {e}", exc_info=True); conn.rollback(); return str(e), 0
+            return inserted_count, skipped_count
+
+    def _copy_applicants(self, cur, import_df, columns):
+        """Streams the rows through COPY into a transaction-scoped staging table and inserts the new emails. Returns the inserted count."""
+        buf = io.StringIO(); import_df.to_csv(buf, index=False, header=False); buf.seek(0) # None becomes an empty field, which CSV COPY reads as NULL
+        cur.execute(STAGE_APPLICANTS_SQL); cur.copy_expert(COPY_APPLICANTS_STAGE_SQL.format(columns=columns), buf)
+        cur.execute(INSERT_STAGED_APPLICANTS_SQL.format(columns=columns))
+        return cur.rowcount
     def clear_all_tables(self):
-        self._connect();
-        if not self.conn: return False
-        drop_command = "DROP TABLE IF EXISTS applicants, communications, applicant_statuses, export_logs, interviewers, interviews CASCADE;"
-        try:
-            with self.conn.cursor() as cur: cur.execute(drop_command); self.conn.commit(); logger.info("Successfully dropped all application tables."); return True
-        except Exception as e: logger.error(f"Error dropping tables: {e}"); self.conn.rollback(); return False
+        with self._get_conn() as conn:
+            if not conn: return False
+            drop_command = "DROP TABLE IF EXISTS applicants, communications, applicant_statuses, export_logs, interviewers, interviews, processed_messages, pending_batches CASCADE;"
+            try:
+                with conn.cursor() as cur: cur.execute(drop_command); conn.commit(); logger.info("Successfully dropped all application tables."); return True
+            except Exception as e: logger.error(f"Error dropping tables: {e}"); conn.rollback(); return False
@@ -1,32 +1,41 @@
+import io
 import os
-from googleapiclient.discovery import build
-from googleapiclient.http import MediaFileUpload
-from utils.auth import get_google_credentials
+from googleapiclient.http import MediaFileUpload, MediaIoBaseUpload
+from utils.auth import get_service
 from utils.logger import logger
+from config import DRIVE_UPLOAD_FOLDER_ID
+
+# Larger files go up in resumable chunks, so a dropped connection only resends the current chunk
+RESUMABLE_UPLOAD_THRESHOLD = 5 * 1024 * 1024
+UPLOAD_CHUNK_SIZE = 1024 * 1024
 
 class DriveHandler:
     def __init__(self):
-        self.service = build('drive', 'v3', credentials=get_google_credentials())
+        self.service = get_service('drive', 'v3')
 
-    def upload_to_drive(self, file_path):
-        """Upload file to Google Drive and return shareable link"""
+    def upload_to_drive(self, file_path, file_data=None):
+        """Upload file to Google Drive and return shareable link. With file_data, the bytes are uploaded and file_path only names the file."""
         try:
             # Use os.path.basename for better cross-platform compatibility
             file_name = os.path.basename(file_path)
             file_metadata = {'name': file_name}
-            media = MediaFileUpload(file_path, mimetype='application/pdf')
+            if DRIVE_UPLOAD_FOLDER_ID: file_metadata['parents'] = [DRIVE_UPLOAD_FOLDER_ID]
+            resumable = (os.path.getsize(file_path) if file_data is None else len(file_data)) > RESUMABLE_UPLOAD_THRESHOLD
+            if file_data is None: media = MediaFileUpload(file_path, mimetype='application/pdf', resumable=resumable, chunksize=UPLOAD_CHUNK_SIZE)
+            else: media = MediaIoBaseUpload(io.BytesIO(file_data), mimetype='application/pdf', resumable=resumable, chunksize=UPLOAD_CHUNK_SIZE)
 
             file = self.service.files().create(
                 body=file_metadata,
                 media_body=media,
                 fields='id, webViewLink'
-            ).execute()
+            ).execute(num_retries=3) # For resumable media this sends chunk by chunk, retrying failed chunks
 
-            # Set permissions to get shareable link
-            self.service.permissions().create(
-                fileId=file['id'],
-                body={'type': 'anyone', 'role': 'reader'}
-            ).execute()
+            # Set permissions to get shareable link; files in the upload folder inherit its link sharing instead
+            if not DRIVE_UPLOAD_FOLDER_ID:
+                self.service.permissions().create(
+                    fileId=file['id'],
+                    body={'type': 'anyone', 'role': 'reader'}
+                ).execute()
 
             return file.get('webViewLink')
         except Exception as e:
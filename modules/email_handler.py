@@ -6,16 +6,17 @@ from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 from email.mime.base import MIMEBase
 from email import encoders
-from googleapiclient.discovery import build
 from googleapiclient.errors import HttpError
-from utils.auth import get_google_credentials
+from utils.auth import get_service
 from utils.logger import logger
-from utils.file_utils import create_temp_file
 
+GMAIL_BATCH_SIZE = 50 # Gmail allows 100 calls per HTTP batch but recommends 50 to stay clear of rate limits
+# Partial-response mask for message content: skips snippet, labels, sizes and the raw header/part metadata we never read
+MESSAGE_CONTENT_FIELDS = 'id,threadId,payload(mimeType,headers,body/data,parts)'
 
 class EmailHandler:
     def __init__(self):
-        self.service = build('gmail', 'v1', credentials=get_google_credentials())
+        self.service = get_service('gmail', 'v1')
 
     def fetch_unread_emails(self):
         """Fetch unread emails that are likely job applications."""
@@ -24,26 +25,60 @@ class EmailHandler:
             keyword_query = "{" + " OR ".join(keywords) + "}"
             query = f'is:unread has:attachment {{filename:pdf OR filename:docx}} {keyword_query}'
             
-            result = self.service.users().messages().list(userId='me', q=query).execute()
-            return result.get('messages', [])
+            # Only ids are used, so ask for nothing else; follow pages so a backlog over 100 messages isn't cut off
+            messages, page_token = [], None
+            while True:
+                result = self.service.users().messages().list(userId='me', q=query, pageToken=page_token, fields='messages/id,nextPageToken').execute()
+                messages.extend(result.get('messages', []))
+                if not (page_token := result.get('nextPageToken')): return messages
         except Exception as e:
             logger.error(f"Email fetch failed: {str(e)}", exc_info=True)
             return []
 
-    def fetch_new_messages_in_thread(self, thread_id):
-        """Fetches all messages in a specific thread."""
+    def watch_mailbox(self, topic_name):
+        """Asks Gmail to publish INBOX changes to a Pub/Sub topic. The watch lasts 7 days and must be renewed."""
         try:
-            thread = self.service.users().threads().get(userId='me', id=thread_id).execute()
-            return thread.get('messages', [])
+            return self.service.users().watch(userId='me', body={'topicName': topic_name, 'labelIds': ['INBOX'], 'labelFilterBehavior': 'INCLUDE'}).execute()
         except Exception as e:
-            logger.error(f"Could not fetch thread {thread_id}: {e}")
-            return []
+            logger.error(f"Gmail watch request failed: {str(e)}", exc_info=True)
+            return None
+
+    def _batch_execute(self, requests):
+        """Sends {key: request} through Gmail HTTP batches; returns {key: response} for the requests that succeeded."""
+        responses = {}
+        def collect(request_id, response, exception):
+            if exception: logger.error(f"Batched Gmail request {request_id} failed: {exception}")
+            else: responses[request_id] = response
+        items = list(requests.items())
+        for i in range(0, len(items), GMAIL_BATCH_SIZE):
+            batch = self.service.new_batch_http_request(callback=collect)
+            for key, request in items[i:i + GMAIL_BATCH_SIZE]: batch.add(request, request_id=key)
+            try: batch.execute()
+            except Exception as e: logger.error(f"Gmail batch request failed: {str(e)}", exc_info=True)
+        return responses
+
+    def fetch_threads(self, thread_ids):
+        """Fetches the messages of several threads in batched round trips. Returns {thread_id: messages}."""
+        responses = self._batch_execute({thread_id: self.service.users().threads().get(userId='me', id=thread_id, format='minimal', fields='messages/id') for thread_id in thread_ids})
+        return {thread_id: thread.get('messages', []) for thread_id, thread in responses.items()}
+
+    def get_email_contents(self, msg_ids):
+        """Batched get_email_content. Returns {msg_id: email data, or None if unparsable}; ids that failed to fetch are absent."""
+        responses = self._batch_execute({msg_id: self.service.users().messages().get(userId='me', id=msg_id, format='full', fields=MESSAGE_CONTENT_FIELDS) for msg_id in msg_ids})
+        return {msg_id: self._parse_message(msg_id, msg) for msg_id, msg in responses.items()}
 
     def get_email_content(self, msg_id):
         """Extracts email content by parsing the 'payload' for maximum compatibility."""
         try:
-            msg = self.service.users().messages().get(userId='me', id=msg_id, format='full').execute()
-            
+            msg = self.service.users().messages().get(userId='me', id=msg_id, format='full', fields=MESSAGE_CONTENT_FIELDS).execute()
+            return self._parse_message(msg_id, msg)
+        except Exception as e:
+            logger.error(f"Email content extraction failed for {msg_id}: {str(e)}", exc_info=True)
+            return None
+
+    def _parse_message(self, msg_id, msg):
+        """Turns a format='full' message resource into the email dict used by the worker."""
+        try:
             if not msg or 'payload' not in msg:
                 logger.error(f"Could not retrieve a valid payload for email ID: {msg_id}. Skipping.")
                 return None
@@ -132,11 +167,11 @@ class EmailHandler:
             logger.error(f"A general error occurred in send_email: {e}", exc_info=True)
             return None
 
-    def save_attachment(self, msg_id):
-        """Saves PDF or DOCX attachment to a temp file."""
+    def get_attachment(self, msg_id):
+        """Returns (filename, bytes) of the first PDF or DOCX attachment, kept in memory, or None."""
         try:
-            msg = self.service.users().messages().get(userId='me', id=msg_id).execute()
-            parts = msg['payload'].get('parts', [])
+            msg = self.service.users().messages().get(userId='me', id=msg_id, fields='payload/parts(filename,body/attachmentId)').execute()
+            parts = msg.get('payload', {}).get('parts', [])
             for part in parts:
                 filename = part.get('filename', '')
                 if filename and (filename.lower().endswith('.pdf') or filename.lower().endswith('.docx')):
@@ -144,14 +179,10 @@ class EmailHandler:
                     att_id = body.get('attachmentId')
                     if att_id:
                         att = self.service.users().messages().attachments().get(userId='me', messageId=msg_id, id=att_id).execute()
-                        file_data = base64.urlsafe_b64decode(att['data'])
-                        file_path = create_temp_file(filename)
-                        with open(file_path, 'wb') as f:
-                            f.write(file_data)
-                        return file_path
+                        return filename, base64.urlsafe_b64decode(att['data'])
             return None
         except Exception as e:
-            logger.error(f"Attachment save failed for {msg_id}: {str(e)}", exc_info=True)
+            logger.error(f"Attachment download failed for {msg_id}: {str(e)}", exc_info=True)
             return None
 
     def mark_as_read(self, msg_id):
@@ -1,19 +1,22 @@
 import pdfplumber
 import docx
+import io
 import re
 from utils.logger import logger
 
 class FileProcessor:
     @staticmethod
-    def extract_text(file_path):
+    def extract_text(file_path, file_data=None):
         """
         Extracts and cleans text from a file, supporting both PDF and DOCX formats.
+        With file_data, the in-memory bytes are read and file_path only determines the format.
         """
         try:
+            source = file_path if file_data is None else io.BytesIO(file_data)
             if file_path.lower().endswith('.pdf'):
-                return PDFProcessor.extract_text(file_path)
+                return PDFProcessor.extract_text(source)
             elif file_path.lower().endswith('.docx'):
-                return WordProcessor.extract_text(file_path)
+                return WordProcessor.extract_text(source)
             else:
                 logger.warning(f"Unsupported file type for: {file_path}")
                 return ""
@@ -23,9 +26,10 @@ class FileProcessor:
 
     @staticmethod
     def clean_text(text):
-        """Cleans extracted text by removing non-ASCII characters and excessive whitespace."""
+        """Cleans extracted text by removing non-ASCII characters and excessive whitespace, keeping line breaks for section detection."""
         text = re.sub(r'[^\x00-\x7F]+', ' ', text)
-        text = re.sub(r'\s+', ' ', text).strip()
+        text = re.sub(r'[^\S\n]+', ' ', text)
+        text = re.sub(r' ?\n[\s]*', '\n', text).strip()
         return text
 
 class PDFProcessor:
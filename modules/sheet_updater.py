@@ -1,17 +1,26 @@
 import json
 from datetime import datetime
-from googleapiclient.discovery import build
 import pandas as pd
-from zoneinfo import ZoneInfo
-from utils.auth import get_google_credentials
+from utils.auth import get_service
+from config import LOCAL_TZ
 from utils.logger import logger
 
+EXPORT_SHEET_TITLE = 'Applicants'
+
+def _column_letter(column_number):
+    """Converts a 1-based column number to its A1-notation letters (1 -> A, 27 -> AA)."""
+    letters = ''
+    while column_number > 0:
+        column_number, remainder = divmod(column_number - 1, 26)
+        letters = chr(65 + remainder) + letters
+    return letters
+
 class SheetsUpdater:
     def __init__(self):
         
-        self.sheets_service = build('sheets', 'v4', credentials=get_google_credentials())
+        self.sheets_service = get_service('sheets', 'v4')
        
-        self.drive_service = build('drive', 'v3', credentials=get_google_credentials())
+        self.drive_service = get_service('drive', 'v3')
 
     def read_sheet_data(self, spreadsheet_id, range_name='Sheet1!A1:Z'):
         """
@@ -40,21 +49,23 @@ class SheetsUpdater:
             logger.error(f"Failed to read data from Google Sheet {spreadsheet_id}: {e}", exc_info=True)
             return f"Error: Could not access the sheet. Please ensure it is public or shared with the service account."
         
-    def create_export_sheet(self, data_to_export, columns):
+    def create_export_sheet(self, rows):
         """
-
         Creates a new Google Sheet, populates it with data, and returns a shareable link.
+        `rows` is a 2D list: the header row followed by one row per applicant, written in a single request.
         """
         try:
             # New, blank Google Sheet
-            local_tz = ZoneInfo("Asia/Kolkata")
-            timestamp_str = datetime.now(local_tz).strftime("%d-%b-%Y at %I.%M %p") 
+            timestamp_str = datetime.now(LOCAL_TZ).strftime("%d-%b-%Y at %I.%M %p") 
             spreadsheet_title = f'Applicant Export ({timestamp_str})'
 
             spreadsheet_body = {
                 'properties': {
                     'title': spreadsheet_title
-                }
+                },
+                'sheets': [{
+                    'properties': {'title': EXPORT_SHEET_TITLE, 'gridProperties': {'frozenRowCount': 1}}
+                }]
             }
             logger.info("Creating new Google Sheet...")
             spreadsheet = self.sheets_service.spreadsheets().create(body=spreadsheet_body).execute()
@@ -62,30 +73,15 @@ class SheetsUpdater:
             spreadsheet_url = spreadsheet.get('spreadsheetUrl')
             logger.info(f"Successfully created sheet with ID: {spreadsheet_id}")
 
-            # Prepare the data for writing 
-            values_to_write = [columns]
-            for applicant in data_to_export:
-                row = [
-                    applicant.get('Name', ''),
-                    applicant.get('Email', ''),
-                    applicant.get('Phone', ''),
-                    applicant.get('Education', ''),
-                    applicant.get('JobHistory', ''),
-                    applicant.get('CvUrl', ''),
-                    applicant.get('Domain', ''),
-                    applicant.get('Status', '')
-                ]
-                values_to_write.append(row)
-            
-            #  Write the data to the new sheet
+            #  Write the whole table to the new sheet in one call
             write_body = {
-                'values': values_to_write
+                'values': rows
             }
-            logger.info(f"Writing {len(values_to_write) - 1} applicant records to the sheet...")
+            logger.info(f"Writing {len(rows) - 1} applicant records to the sheet...")
             self.sheets_service.spreadsheets().values().update(
                 spreadsheetId=spreadsheet_id,
-                range='A1', 
-                valueInputOption='USER_ENTERED',
+                range=f'{EXPORT_SHEET_TITLE}!A1:{_column_letter(len(rows[0]))}{len(rows)}',
+                valueInputOption='RAW',
                 body=write_body
             ).execute()
             
@@ -1,5 +1,7 @@
 import os
 import pickle
+from functools import lru_cache
+from googleapiclient.discovery import build
 from google.auth.transport.requests import Request
 from google_auth_oauthlib.flow import InstalledAppFlow
 from config import SCOPES
@@ -26,4 +28,9 @@ def get_google_credentials():
         with open(token_path, 'wb') as token:
             pickle.dump(creds, token)
     
-    return creds
\ No newline at end of file
+    return creds
+
+@lru_cache(maxsize=None)
+def get_service(api, version):
+    """Returns one shared client per API, built from the discovery documents bundled with the client library (no network fetch)."""
+    return build(api, version, credentials=get_google_credentials(), static_discovery=True, cache_discovery=False)
\ No newline at end of file
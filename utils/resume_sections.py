@@ -0,0 +1,26 @@
+import re
+
+# Lines that open a resume section. Extracted text keeps one line per heading, so whole-line matches avoid
+# tripping over the same words in prose ("3 years of experience in ...")
+SECTION_HEADINGS = {
+    'experience': re.compile(r'(work |professional |relevant )?(experience|employment( history)?|work history|career history|internships?)', re.I),
+    'education': re.compile(r'(education(al)?( background| qualifications?| details)?|academic (background|qualifications?|details)|qualifications?)', re.I),
+    'other': re.compile(r'((technical |key )?skills|projects|certifications?|achievements|awards|(professional )?summary|profile|(career )?objective|languages|interests|hobbies|declaration|personal (details|information)|references)', re.I),
+}
+MAX_HEADING_LENGTH = 40
+
+def split_sections(text):
+    """Splits resume text into {'header': ..., 'experience': ..., 'education': ...}; sections without a heading are absent."""
+    sections, current = {}, 'header'
+    for line in text.split('\n'):
+        heading = line.strip(' :-|*#\u2022').strip()
+        name = next((name for name, pattern in SECTION_HEADINGS.items() if pattern.fullmatch(heading)), None) if len(heading) <= MAX_HEADING_LENGTH else None
+        if name: current = name
+        else: sections.setdefault(current, []).append(line)
+    sections.pop('other', None)
+    return {name: '\n'.join(lines) for name, lines in sections.items()}
+
+def resume_snippet(sections, wanted, resume_text):
+    """Joins the wanted sections, falling back to the whole resume if any wanted section (besides the header) wasn't found."""
+    if any(name != 'header' and name not in sections for name in wanted): return resume_text
+    return '\n'.join(sections[name] for name in wanted if name in sections)
\ No newline at end of file